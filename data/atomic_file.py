@@ -0,0 +1,25 @@
+import json
+import os
+import threading
+
+
+def write_json(path, data, **kwargs):
+    """
+    Write `data` to `path` as JSON, passing `kwargs` on to `json.dump`.
+    The data is written to a temporary file first, then moved into
+    place, so that neither a crash nor a concurrent reader ever sees a
+    half-written file
+    """
+    # Unique to each thread, so that concurrent writers of the same
+    # path don't write to the same temporary file
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary_path, "w") as f:
+            json.dump(data, f, **kwargs)
+        os.replace(temporary_path, path)
+    except BaseException:
+        try:
+            os.remove(temporary_path)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,87 @@
+import datetime
+
+
+# Bump this whenever the compact encoding changes, so that clients can
+# tell which decoder to use. Records without a version use the legacy
+# encoding, a mapping of every night to whether it's available.
+AVAILABILITY_ENCODING_VERSION = 2
+
+
+def encode_availability(availability):
+    """
+    Compactly encode a mapping of nights to whether they're available,
+    as the first and last nights covered plus a list of
+    `[offset from first night, number of nights]` runs of available nights
+    """
+    if availability is None:
+        return None
+
+    nights = sorted(availability)
+    first_night = datetime.date.fromisoformat(nights[0])
+
+    runs = []
+    for night in nights:
+        if not availability[night]:
+            continue
+        offset = (datetime.date.fromisoformat(night) - first_night).days
+        if runs and runs[-1][0] + runs[-1][1] == offset:
+            runs[-1][1] += 1
+        else:
+            runs.append([offset, 1])
+
+    return {
+        "version": AVAILABILITY_ENCODING_VERSION,
+        "first_night": nights[0],
+        "last_night": nights[-1],
+        "available": runs,
+    }
+
+
+def decode_availability(encoded):
+    """
+    Reverse `encode_availability`. Any nights that were missing from the
+    original mapping, between its first and last nights, are decoded as
+    unavailable. Legacy-encoded availability is returned as-is.
+    """
+    if encoded is None or "version" not in encoded:
+        return encoded
+
+    first_night = datetime.date.fromisoformat(encoded["first_night"])
+    last_night = datetime.date.fromisoformat(encoded["last_night"])
+    availability = {
+        (first_night + datetime.timedelta(days=i)).isoformat(): False
+        for i in range((last_night - first_night).days + 1)
+    }
+    for offset, length in encoded["available"]:
+        for i in range(offset, offset + length):
+            availability[(first_night + datetime.timedelta(days=i)).isoformat()] = True
+
+    return availability
+
+
+def get_available_runs(availability):
+    """
+    Return the maximal runs of available nights, in order, as
+    `(first night, last night)` pairs of dates. Accepts either encoding
+    """
+    if availability is None:
+        return []
+    if "version" not in availability:
+        availability = encode_availability(availability)
+
+    first_night = datetime.date.fromisoformat(availability["first_night"])
+    return [
+        (
+            first_night + datetime.timedelta(days=offset),
+            first_night + datetime.timedelta(days=offset + length - 1),
+        )
+        for offset, length in availability["available"]
+    ]
+
+
+def encode_record(record):
+    return {**record, "availability": encode_availability(record["availability"])}
+
+
+def decode_record(record):
+    return {**record, "availability": decode_availability(record["availability"])}
@@ -0,0 +1,60 @@
+import bisect
+import datetime
+
+from availability_encoding import get_available_runs
+
+
+class AvailabilityIndex:
+    """
+    Answers "which facilities have at least N consecutive available
+    nights between two dates?" without walking every night. Each
+    facility's runs of available nights are sorted and never overlap,
+    so the first run that could hold a window is found by binary search
+    on the runs' last nights.
+
+    Both dates are inclusive, and refer to nights: a window of 2 nights
+    between June 1 and June 2 means staying the nights of June 1 and
+    June 2, checking out on June 3.
+    """
+
+    def __init__(self, records):
+        self.runs = {}
+        self.last_nights = {}
+        for record in records:
+            facility_id = record["metadata"]["facility_id"]
+            runs = get_available_runs(record["availability"])
+            self.runs[facility_id] = runs
+            self.last_nights[facility_id] = [last_night for _, last_night in runs]
+
+    def get_windows(self, facility_id, nights, after=None, before=None):
+        """
+        Return each run of available nights at this facility, clipped to
+        `after` and `before`, that is at least `nights` long
+        """
+        runs = self.runs.get(facility_id, [])
+        # Any qualifying run must end at least `nights - 1` nights after
+        # `after`, so skip straight past the runs that end too early
+        start = 0
+        if after is not None:
+            start = bisect.bisect_left(
+                self.last_nights[facility_id],
+                after + datetime.timedelta(days=nights - 1),
+            )
+
+        windows = []
+        for first_night, last_night in runs[start:]:
+            if before is not None and first_night > before:
+                break
+            first_night = max(first_night, after) if after else first_night
+            last_night = min(last_night, before) if before else last_night
+            if (last_night - first_night).days + 1 >= nights:
+                windows.append((first_night, last_night))
+        return windows
+
+    def find_facilities(self, nights, after=None, before=None):
+        """Return the IDs of facilities with a window of at least `nights`"""
+        return [
+            facility_id
+            for facility_id in self.runs
+            if self.get_windows(facility_id, nights, after, before)
+        ]
@@ -0,0 +1,120 @@
+#! /usr/bin/env python3
+
+"""
+Compare parsing a campsite's full `/availability/campsite/{id}/all`
+response in one go against parsing it as it streams in. The synthetic
+response is written to a file, which each method then reads in chunks
+(as it would from the network) in its own subprocess, so that peak
+RSS can be measured cleanly.
+"""
+
+import argparse
+import datetime
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import config
+from streaming import iter_object_items
+
+
+STATUSES = ["Reserved", "Available", "NYR", "Not Available", "Open"]
+
+
+def build_payload(years):
+    """Build a synthetic response covering this many years of nights"""
+    random.seed(0)
+    start = datetime.date.today() - datetime.timedelta(days=365 * years // 2)
+    nights = [
+        (start + datetime.timedelta(days=i)).isoformat() + "T00:00:00Z"
+        for i in range(365 * years)
+    ]
+    return json.dumps(
+        {
+            "availability": {
+                "campsite_id": "1",
+                "availabilities": {night: random.choice(STATUSES) for night in nights},
+                "quantities": {night: 1 for night in nights},
+            }
+        }
+    ).encode("utf-8")
+
+
+def iter_chunks(path):
+    with open(path, "rb") as f:
+        while chunk := f.read(config.STREAM_CHUNK_SIZE_BYTES):
+            yield chunk
+
+
+def keep(night, status, look_until):
+    return not (night > look_until and status != "Available")
+
+
+def parse_whole(chunks, look_until):
+    data = json.loads(b"".join(chunks))["availability"]["availabilities"]
+    return {k: v for k, v in data.items() if keep(k, v, look_until)}
+
+
+def parse_streamed(chunks, look_until):
+    return {
+        k: v
+        for k, v in iter_object_items(chunks, "availabilities")
+        if keep(k, v, look_until)
+    }
+
+
+def run_method(method, path):
+    look_until = (datetime.date.today() + datetime.timedelta(days=183)).isoformat()
+    parse = {"whole": parse_whole, "streamed": parse_streamed}[method]
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started_at = time.perf_counter()
+    nights = parse(iter_chunks(path), look_until)
+    elapsed = time.perf_counter() - started_at
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(
+        json.dumps(
+            {
+                "method": method,
+                "nights_kept": len(nights),
+                "parse_seconds": round(elapsed, 4),
+                # `ru_maxrss` is in kilobytes on Linux
+                "peak_rss_increase_kb": peak_rss - baseline_rss,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--years", type=int, default=30, help="Years of nights in the response"
+    )
+    parser.add_argument("--method", choices=["whole", "streamed"])
+    parser.add_argument("--payload-path")
+    args = parser.parse_args()
+
+    if args.method:
+        run_method(args.method, args.payload_path)
+    else:
+        with tempfile.NamedTemporaryFile(suffix=".json") as f:
+            f.write(build_payload(args.years))
+            f.flush()
+            print("Response size: {} bytes".format(f.tell()))
+            for method in ["whole", "streamed"]:
+                subprocess.run(
+                    [
+                        sys.executable,
+                        __file__,
+                        "--method",
+                        method,
+                        "--payload-path",
+                        f.name,
+                    ],
+                    check=True,
+                )
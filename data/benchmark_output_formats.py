@@ -0,0 +1,135 @@
+#! /usr/bin/env python3
+
+"""
+Compare the size of each output format, and how long each takes to
+encode and decode, for a synthetic set of facility records (or for an
+existing output file).
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import random
+import time
+
+from availability_encoding import decode_record, encode_record
+from output_formats import (
+    brotli,
+    brotli_compress,
+    decode_columnar,
+    encode_columnar,
+    gzip_compress,
+    msgpack,
+)
+
+
+def build_records(facility_count):
+    """Build records with about six months of availability each"""
+    random.seed(0)
+    start = datetime.date.today()
+    return [
+        {
+            "metadata": {
+                "facility_id": str(100000 + i),
+                "facility_name": "SYNTHETIC LOOKOUT {}".format(i),
+                "facility_latitude": round(random.uniform(42, 49), 4),
+                "facility_longitude": round(random.uniform(-124, -110), 4),
+                "facility_description_map": {"Overview": "A lookout. " * 40},
+            },
+            "attributes": {"Max Num of People": "4"},
+            "images": [],
+            "cell_coverage": None,
+            "rate": None,
+            "availability": {
+                (start + datetime.timedelta(days=night)).isoformat(): (
+                    random.random() < 0.3
+                )
+                for night in range(183)
+            },
+            "extras": {"on_stilts": False},
+        }
+        for i in range(facility_count)
+    ]
+
+
+def encode_compact(records):
+    return json.dumps(
+        [encode_record(record) for record in records], separators=(",", ":")
+    ).encode("utf-8")
+
+
+def decode_compact(body):
+    return [decode_record(record) for record in json.loads(body)]
+
+
+def get_formats():
+    formats = {
+        "json (legacy)": (
+            lambda records: json.dumps(records, indent=4).encode("utf-8"),
+            json.loads,
+        ),
+        "json": (encode_compact, decode_compact),
+        "json.gz": (
+            lambda records: gzip_compress(encode_compact(records)),
+            lambda body: decode_compact(gzip.decompress(body)),
+        ),
+    }
+    if brotli is not None:
+        formats["json.br"] = (
+            lambda records: brotli_compress(encode_compact(records)),
+            lambda body: decode_compact(brotli.decompress(body)),
+        )
+    if msgpack is not None:
+        formats["msgpack"] = (encode_columnar, decode_columnar)
+        formats["msgpack.gz"] = (
+            lambda records: gzip_compress(encode_columnar(records)),
+            lambda body: decode_columnar(gzip.decompress(body)),
+        )
+    return formats
+
+
+def time_best_of(function, argument, repeat):
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = function(argument)
+        timings.append(time.perf_counter() - started_at)
+    return result, min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--facilities",
+        type=int,
+        default=1000,
+        help="How many synthetic facilities to build records for",
+    )
+    parser.add_argument(
+        "--input", help="Benchmark an existing `availability.json` instead"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Take the fastest of this many runs"
+    )
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, "rb") as f:
+            records = decode_compact(f.read())
+    else:
+        records = build_records(args.facilities)
+
+    results = []
+    for name, (encode, decode) in get_formats().items():
+        body, encode_seconds = time_best_of(encode, records, args.repeat)
+        _, decode_seconds = time_best_of(decode, body, args.repeat)
+        results.append(
+            {
+                "format": name,
+                "bytes": len(body),
+                "encode_seconds": round(encode_seconds, 4),
+                "decode_seconds": round(decode_seconds, 4),
+            }
+        )
+    print(json.dumps({"record_count": len(records), "formats": results}, indent=4))
@@ -0,0 +1,217 @@
+#! /usr/bin/env python3
+
+"""
+Compare normalizing campground metadata responses with the declarative
+projection in `get_availability.py` against the chain of `del` and
+`assert` statements that it replaced, on recorded responses (or on
+synthetic ones, padded out to the size of real ones). Some responses
+can be perturbed, as if Recreation.gov had changed a field, to show how
+each method copes.
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import sys
+import time
+
+import get_availability
+import stand_in_server
+
+
+def build_payloads(facility_count):
+    """Build campground responses, about as large as real ones"""
+    payloads = []
+    for i in range(facility_count):
+        campground = stand_in_server.synthesize_campground(str(10000000 + i))
+        campground["campground"].update(
+            {
+                "facility_description_map": {
+                    heading: "Some description. " * 50
+                    for heading in ["Overview", "Facilities", "Natural Features"]
+                },
+                "facility_rules": {"Quiet Hours": {"description": "10pm to 6am"}},
+                "links": [
+                    {"title": "Link {}".format(j), "url": "https://example.com/"}
+                    for j in range(5)
+                ],
+                "activities": [
+                    {"activity_description": "Activity {}".format(j)} for j in range(10)
+                ],
+            }
+        )
+        payloads.append(json.dumps(campground).encode("utf-8"))
+    return payloads
+
+
+def load_payloads(fixtures_directory):
+    """Load campground responses recorded by `stand_in_server.py --record`"""
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(fixtures_directory, "*.json"))):
+        if re.fullmatch(r"api_camps_campgrounds_\d+\.json", os.path.basename(path)):
+            with open(path, "rb") as f:
+                payloads.append(f.read())
+    return payloads
+
+
+def perturb(payload):
+    """Change a response the way Recreation.gov might, without warning"""
+    data = json.loads(payload)
+    data["campground"]["fee_model"] = 2
+    data["campground"]["newly_added_field"] = True
+    return json.dumps(data).encode("utf-8")
+
+
+def project_with_del_chain(campground_metadata):
+    """How `get_facility_metadata` normalized responses before the projection"""
+    del campground_metadata["is_deactivated"]
+    del campground_metadata["activated_date"]
+    assert campground_metadata["attributes"] is None
+    del campground_metadata["attributes"]
+    del campground_metadata["certification_log"]
+    del campground_metadata["city"]
+    del campground_metadata["created_by"]
+    del campground_metadata["created_date"]
+    del campground_metadata["facility_time_zone"]
+    assert not campground_metadata["is_commercially_managed"]
+    del campground_metadata["is_commercially_managed"]
+    assert not campground_metadata["facility_lookups"]
+    del campground_metadata["facility_lookups"]
+    assert campground_metadata["inventory_type_id"] == "3"
+    del campground_metadata["inventory_type_id"]
+    if "legacy_facility_id" in campground_metadata:
+        del campground_metadata["legacy_facility_id"]
+    assert campground_metadata["order_components"] == {
+        "camping_equipment": True,
+        "group_leader_details": True,
+        "group_size": True,
+        "num_vehicles": True,
+        "pass": True,
+    }
+    del campground_metadata["order_components"]
+    del campground_metadata["org_id"]
+    del campground_metadata["receipt_autoprint"]
+    del campground_metadata["receipt_custom_text"]
+    del campground_metadata["state"]
+    del campground_metadata["updated_by"]
+    del campground_metadata["updated_date"]
+    del campground_metadata["addresses"]
+    if "amenities" in campground_metadata:
+        del campground_metadata["amenities"]
+    assert campground_metadata["facility_adaaccess"] != "Y"
+    del campground_metadata["facility_adaaccess"]
+    assert not campground_metadata["facility_map_url"]
+    del campground_metadata["facility_map_url"]
+    assert not campground_metadata["facility_reservation_url"]
+    del campground_metadata["facility_reservation_url"]
+    assert campground_metadata["facility_type"] == "STANDARD"
+    del campground_metadata["facility_type"]
+    del campground_metadata["facility_use_fee_description"]
+    assert campground_metadata["fee_model"] == 1
+    del campground_metadata["fee_model"]
+    assert campground_metadata["stay_limit"] == ""
+    del campground_metadata["stay_limit"]
+
+    campground_metadata["activities"] = (
+        [i["activity_description"] for i in campground_metadata["activities"]]
+        if campground_metadata["activities"]
+        else []
+    )
+    campground_metadata["links"] = [
+        {"title": i["title"], "url": i["url"]} for i in campground_metadata["links"]
+    ]
+    if "notices" in campground_metadata:
+        assert all(
+            [i["notice_type"] == "warning" for i in campground_metadata["notices"]]
+        )
+        campground_metadata["notices"] = (
+            [i["notice_text"] for i in campground_metadata["notices"]]
+            if campground_metadata["notices"]
+            else []
+        )
+    return campground_metadata
+
+
+def run_method(method, payloads, repeat):
+    """Return the fastest time to normalize every payload, and how many failed"""
+    timings = []
+    for _ in range(repeat):
+        # Decode outside of the timing, since the old method mutates
+        # its input
+        campgrounds = [json.loads(payload)["campground"] for payload in payloads]
+        failure_count = 0
+        started_at = time.perf_counter()
+        for campground in campgrounds:
+            try:
+                method(campground)
+            except (AssertionError, KeyError, ValueError):
+                failure_count += 1
+        timings.append(time.perf_counter() - started_at)
+    return min(timings), failure_count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--facilities",
+        type=int,
+        default=5000,
+        help="How many synthetic campground responses to normalize",
+    )
+    parser.add_argument(
+        "--fixtures-directory",
+        help="Normalize the campground responses recorded here instead",
+    )
+    parser.add_argument(
+        "--perturbed-fraction",
+        type=float,
+        default=0.01,
+        help="Fraction of responses to change, as if the API had changed",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Take the fastest of this many runs"
+    )
+    args = parser.parse_args()
+
+    if args.fixtures_directory:
+        payloads = load_payloads(args.fixtures_directory)
+    else:
+        payloads = build_payloads(args.facilities)
+    if not payloads:
+        sys.exit("Found no campground responses to normalize")
+    random.seed(0)
+    payloads = [
+        perturb(payload) if random.random() < args.perturbed_fraction else payload
+        for payload in payloads
+    ]
+
+    results = []
+    for name, method in [
+        ("del chain", project_with_del_chain),
+        ("projection", get_availability.project_campground),
+    ]:
+        seconds, failure_count = run_method(method, payloads, args.repeat)
+        results.append(
+            {
+                "method": name,
+                "seconds": round(seconds, 4),
+                "microseconds_per_response": round(seconds / len(payloads) * 1e6, 2),
+                "failure_count": failure_count,
+            }
+        )
+    print(
+        json.dumps(
+            {
+                "response_count": len(payloads),
+                "mean_response_bytes": sum(map(len, payloads)) // len(payloads),
+                "methods": results,
+                "projection_warnings": dict(
+                    get_availability.project_campground.warnings.counts
+                ),
+            },
+            indent=4,
+        )
+    )
@@ -0,0 +1,69 @@
+#! /usr/bin/env python3
+
+"""
+Show how the scraper's runtime, request count, and memory grow with the
+size of the catalog, by running `benchmark_scraper.py` against made-up
+catalogs of increasing size. Each size runs in its own process, so that
+peak memory is measured separately for each.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes",
+        type=lambda sizes: [int(size) for size in sizes.split(",")],
+        default=[100, 500, 1000, 2000, 5000],
+        help="Comma-separated catalog sizes to benchmark",
+    )
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument(
+        "--scraper-requests-per-second",
+        type=float,
+        default=200,
+        help="Hold the scraper to this rate, so runs finish in minutes",
+    )
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        output = subprocess.run(
+            [
+                sys.executable,
+                os.path.join(sys.path[0], "benchmark_scraper.py"),
+                "--catalog-size",
+                str(size),
+                "--facilities",
+                str(size),
+                "--latency",
+                str(args.latency),
+                "--scraper-requests-per-second",
+                str(args.scraper_requests_per_second),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        ).stdout
+        result = json.loads(output)
+        results.append(
+            {
+                "facilities": result["facilities"],
+                "elapsed_seconds": result["elapsed_seconds"],
+                "seconds_per_facility": round(
+                    result["elapsed_seconds"] / result["facilities"], 4
+                ),
+                "discovery_requests": result["discovery_requests"],
+                "requests_issued": result["requests_issued"],
+                "requests_per_facility": result["requests_per_facility"],
+                "peak_rss_kb": result["peak_rss_kb"],
+            }
+        )
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    print(json.dumps(results, indent=4))
@@ -0,0 +1,130 @@
+#! /usr/bin/env python3
+
+"""
+Run `get_availability.py` end-to-end against a local stand-in for
+Recreation.gov (see `stand_in_server.py`), and report its throughput.
+No network connection is needed, and nothing is written to the
+`data/` directory. Run with `--help` to see how to inject latency or
+throttling, or to discover and scrape a larger, made-up catalog.
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import compile_facility_ids
+import config
+import get_availability
+import stand_in_server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--facilities",
+        type=int,
+        default=20,
+        help="How many facilities, from the compiled list, to scrape",
+    )
+    parser.add_argument(
+        "--catalog-size",
+        type=int,
+        help=(
+            "Instead of the compiled list, discover facilities from search "
+            "results listing this many made-up facilities"
+        ),
+    )
+    parser.add_argument(
+        "--fixtures-directory",
+        default=os.path.join(sys.path[0], "fixtures"),
+        help="Recorded responses to replay; any that are missing are synthesized",
+    )
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--forbidden-probability", type=float, default=0)
+    parser.add_argument("--max-requests-per-second", type=float)
+    parser.add_argument(
+        "--scraper-requests-per-second",
+        type=float,
+        help="Hold the scraper to this rate, instead of learning one",
+    )
+    parser.add_argument(
+        "--use-cache",
+        action="store_true",
+        help="Don't pass `--no-cache` to the scraper",
+    )
+    args = parser.parse_args()
+
+    server = stand_in_server.start_in_background(
+        fixtures_directory=args.fixtures_directory,
+        latency=args.latency,
+        forbidden_probability=args.forbidden_probability,
+        max_requests_per_second=args.max_requests_per_second,
+        synthesize=True,
+        catalog_size=args.catalog_size,
+    )
+    config.RECREATION_GOV_BASE_URL = server.base_url
+
+    if args.scraper_requests_per_second:
+        rate = args.scraper_requests_per_second
+        get_availability.rate_limiter.min_rate = rate
+        get_availability.rate_limiter.max_rate = rate
+        for bucket in get_availability.rate_limiter.buckets.values():
+            bucket.set_rate(rate)
+        get_availability.rate_limiter.total_bucket.set_rate(rate)
+        compile_facility_ids.get_host_rate_limiter(server.base_url).set_rate(rate)
+
+    discovery_requests = 0
+    if args.catalog_size is not None:
+        facility_ids = compile_facility_ids.get_recreationgov_search_ids("LOOKOUT")[
+            : args.facilities
+        ]
+        discovery_requests = server.request_count
+    else:
+        with open(os.path.join(sys.path[0], "compiled_facility_ids.txt")) as f:
+            facility_ids = f.read().split("\n")[: args.facilities]
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        facility_ids_path = os.path.join(data_dir, "facility_ids.txt")
+        with open(facility_ids_path, "w") as f:
+            f.write("\n".join(facility_ids))
+
+        scraper_args = [
+            "--data-dir",
+            data_dir,
+            "--facility-ids-file",
+            facility_ids_path,
+        ]
+        if not args.use_cache:
+            scraper_args.append("--no-cache")
+
+        started_at = time.monotonic()
+        get_availability.main(scraper_args)
+        elapsed = time.monotonic() - started_at
+
+    print(
+        json.dumps(
+            {
+                "facilities": len(facility_ids),
+                "elapsed_seconds": round(elapsed, 2),
+                "facilities_per_minute": round(len(facility_ids) / elapsed * 60, 2),
+                "discovery_requests": discovery_requests,
+                "requests_issued": server.request_count - discovery_requests,
+                "requests_per_facility": round(
+                    (server.request_count - discovery_requests) / len(facility_ids), 2
+                ),
+                "requests_forbidden": server.forbidden_count,
+                "bytes_downloaded": server.bytes_sent,
+                "connections": get_availability.http_client.get_stats(),
+                "rate_limit_wait_seconds": round(
+                    get_availability.rate_limiter.total_wait_seconds, 2
+                ),
+                # `ru_maxrss` is in kilobytes on Linux
+                "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            },
+            indent=4,
+        )
+    )
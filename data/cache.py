@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+import atomic_file
+
+
+class ResponseCache:
+    """
+    An on-disk cache of JSON API responses, one file per URL. How long
+    a response stays fresh is decided by the first pattern in `ttls`
+    that matches its URL; URLs without a match (or with a TTL of `0`)
+    are never stored. Once stale, a response is revalidated using the
+    `ETag` and `Last-Modified` headers it was originally served with,
+    if any
+    """
+
+    def __init__(self, directory, ttls, max_age, enabled=True):
+        self.directory = directory
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self.max_age = max_age
+        self.enabled = enabled
+
+    def get_ttl(self, url):
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return 0
+
+    def _get_path(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _write(self, url, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_file.write_json(self._get_path(url), entry)
+
+    def lookup(self, url):
+        """Return the cached entry for a URL, or `None` if there is none"""
+        if not self.enabled or self.get_ttl(url) == 0:
+            return None
+        try:
+            with open(self._get_path(url), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def is_fresh(self, url, entry):
+        return time.time() - entry["fetched_at"] < self.get_ttl(url)
+
+    def get_conditional_headers(self, entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, body, response_headers):
+        if not self.enabled or self.get_ttl(url) == 0:
+            return
+        self._write(
+            url,
+            {
+                "url": url,
+                "fetched_at": time.time(),
+                "etag": response_headers.get("ETag"),
+                "last_modified": response_headers.get("Last-Modified"),
+                "body": body,
+            },
+        )
+
+    def refresh(self, url, entry):
+        """Mark an entry as fresh again, after the server confirmed it's unchanged"""
+        entry["fetched_at"] = time.time()
+        self._write(url, entry)
+
+    def evict_stale_entries(self):
+        """
+        Delete entries that haven't been fetched or revalidated within
+        `max_age`, or whose URL is no longer configured to be cached.
+        Returns the number of entries evicted
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+
+        evicted_count = 0
+        for file_name in os.listdir(self.directory):
+            path = os.path.join(self.directory, file_name)
+            try:
+                with open(path, "r") as f:
+                    entry = json.load(f)
+                is_stale = (
+                    time.time() - entry["fetched_at"] > self.max_age
+                    or self.get_ttl(entry["url"]) == 0
+                )
+            except (json.JSONDecodeError, KeyError):
+                is_stale = True
+            if is_stale:
+                os.remove(path)
+                evicted_count += 1
+
+        return evicted_count
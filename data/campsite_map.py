@@ -0,0 +1,51 @@
+import json
+import threading
+import time
+
+import atomic_file
+
+
+class CampsiteMap:
+    """
+    A persistent mapping of each facility ID to its campsites' IDs,
+    types, and accessibility, which almost never change. Entries are
+    re-fetched only once they're older than `max_age` seconds, or if
+    they're missing.
+    """
+
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def load(self, path):
+        try:
+            with open(path, "r") as f:
+                entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        with self._lock:
+            self.entries = entries
+
+    def save(self, path):
+        with self._lock:
+            entries = dict(sorted(self.entries.items()))
+        atomic_file.write_json(path, entries, indent=4)
+
+    def get(self, facility_id):
+        """
+        Return a list of a facility's campsites' metadata, or `None` if
+        the facility isn't mapped or its entry is due for a refresh
+        """
+        with self._lock:
+            entry = self.entries.get(facility_id)
+        if entry is None or time.time() - entry["refreshed_at"] > self.max_age:
+            return None
+        return entry["campsites"]
+
+    def set(self, facility_id, campsites):
+        with self._lock:
+            self.entries[facility_id] = {
+                "campsites": campsites,
+                "refreshed_at": time.time(),
+            }
@@ -1,23 +1,112 @@
 #! /usr/bin/env python3
 
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
 import os
 import re
 import sys
-import time
+import threading
+from urllib.parse import urljoin, urlparse
 
 import lxml.html
 import requests
 
+import atomic_file
 import config
-
+from http_client import HttpClient
+from throttle import TokenBucket
 
 logger = logging.getLogger(__file__)
 logger.addHandler(logging.StreamHandler())
 logger.setLevel(logging.INFO)
 
 
+FACILITY_URL_PATTERN = re.compile(
+    r"https://www\.recreation\.gov/camping/campgrounds/(\d+)"
+)
+
+# Requests to each host reuse a pool of keep-alive connections
+http_client = HttpClient(
+    config.REQUEST_TIMEOUT_SECONDS,
+    config.HTTP_POOL_HOST_COUNT,
+    config.HTTP_POOL_SIZE,
+    headers=config.FAKE_USER_AGENT_HEADER,
+)
+
+# Each host gets its own rate limit, so that links to different
+# websites can be resolved concurrently without hammering any of them
+host_rate_limiters = {}
+host_rate_limiters_lock = threading.Lock()
+
+
+def get_host_rate_limiter(url):
+    host = urlparse(url).netloc
+    with host_rate_limiters_lock:
+        if host not in host_rate_limiters:
+            host_rate_limiters[host] = TokenBucket(config.MAX_REQUESTS_PER_SECOND)
+        return host_rate_limiters[host]
+
+
+def resolve_facility_id(link):
+    """
+    Follow a link's redirects until one points to a Recreation.gov
+    campground, and return that campground's facility ID. Only headers
+    are requested, and the chain is abandoned as soon as the facility
+    ID is known, so Recreation.gov itself is never actually requested.
+    Returns `None` if the link doesn't lead to a campground, and raises
+    `HTTPError` if a server answers with an error instead, since the
+    link might still resolve on a later try.
+    """
+    url = link
+    for _ in range(config.MAX_REDIRECTS):
+        search = FACILITY_URL_PATTERN.search(url)
+        if search:
+            return search.group(1)
+
+        get_host_rate_limiter(url).acquire()
+        response = http_client.head(url, allow_redirects=False)
+        # Some servers don't support `HEAD` requests, so fall back to a
+        # `GET` request whose body is never downloaded
+        if response.status_code == 405:
+            with http_client.get(url, allow_redirects=False, stream=True) as response:
+                pass
+
+        if not response.is_redirect:
+            # Only a successful response shows that the link really
+            # doesn't lead to a campground; errors such as `403`, `429`,
+            # and `5xx` may well be temporary
+            if not 200 <= response.status_code < 300:
+                raise requests.exceptions.HTTPError(
+                    "{} response from {}".format(response.status_code, url),
+                    response=response,
+                )
+            return None
+        url = urljoin(url, response.headers["Location"])
+        logger.debug("Redirected to {}".format(url))
+
+    return None
+
+
+def get_resolved_links():
+    """Load the cache of links that have already been resolved"""
+    try:
+        with open(os.path.join(sys.path[0], config.RESOLVED_LINKS_FILE_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_resolved_links(resolved_links):
+    atomic_file.write_json(
+        os.path.join(sys.path[0], config.RESOLVED_LINKS_FILE_NAME),
+        resolved_links,
+        indent=4,
+        sort_keys=True,
+    )
+
+
 def get_firelookoutorg_ids():
     """
     Gather the facility IDs of all possible locations from the
@@ -28,63 +117,90 @@ def get_firelookoutorg_ids():
     logger.info("Fetching facility IDs from firelookout.org")
 
     LISTING_URL = "https://firelookout.org/resources/rentals/"
-    listing_page = requests.get(LISTING_URL, headers=config.FAKE_USER_AGENT_HEADER)
+    listing_page = http_client.get(LISTING_URL)
     listing_doc = lxml.html.fromstring(listing_page.content)
     links = listing_doc.xpath('//article/div[@class="entry-content"]//a/@href')
 
-    facility_ids = []
-    for link in links:
-        time.sleep(config.SECONDS_BETWEEN_REQUESTS)
+    # Links that were resolved by a previous run don't need to be
+    # requested again
+    resolved_links = get_resolved_links()
+    unresolved_links = sorted(set(links) - set(resolved_links))
+    logger.info(
+        "Resolving {} new links; {} were already resolved".format(
+            len(unresolved_links), len(set(links)) - len(unresolved_links)
+        )
+    )
+
+    def resolve_link(link):
         # As of now, at least one link on the page fails to respond:
         # http://www.gorp.com/hiking-guide/travel-ta-hiking-washington-oregon-camping-sidwcmdev_057030.html
         try:
-            response = requests.get(
-                link,
-                headers=config.FAKE_USER_AGENT_HEADER,
-                timeout=config.REQUEST_TIMEOUT_SECONDS,
-            )
+            resolved_links[link] = resolve_facility_id(link)
         except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
             logger.warning("Server timed out from request to {}".format(link))
-            continue
-        redirected_url = response.url
-        logger.debug("Redirected to {}".format(redirected_url))
-        search = re.search(
-            r"https://www\.recreation\.gov/camping/campgrounds/(\d+)", redirected_url
-        )
-        if search:
-            facility_id = search.group(1)
-            facility_ids.append(facility_id)
+        # Left out of the cache, so that the link is retried next run
+        except requests.exceptions.HTTPError as e:
+            logger.warning("Failed to resolve {}: {}".format(link, e))
+
+    with ThreadPoolExecutor(
+        max_workers=config.MAX_CONCURRENT_LINK_RESOLUTIONS
+    ) as executor:
+        list(executor.map(resolve_link, unresolved_links))
+    save_resolved_links(resolved_links)
+
+    facility_ids = [
+        resolved_links[link] for link in links if resolved_links.get(link) is not None
+    ]
 
     logger.info("Found {} IDs".format(len(facility_ids)))
     return facility_ids
 
 
-def get_recreationgov_search_ids():
+def get_recreationgov_search_ids(campsite_type):
     """
-    Use Recreation.gov's search interface to gather facility
-    IDs that have been formally tagged as `Lookout`
+    Use Recreation.gov's search interface to gather the IDs of
+    facilities that have campsites formally tagged with a campsite type,
+    such as `LOOKOUT`, paging through all of the results
     """
-    logger.info("Fetching facility IDs from the Recreation.gov search tool")
-
-    SEARCH_URL = "https://www.recreation.gov/api/search"
-    SEARCH_PARAMS = {
-        # The `fq` parameter key is used twice, which is allowed
-        "fq": [
-            "campsite_type:LOOKOUT",
-            # Exclude non-camping overlook locations, such as
-            # https://www.recreation.gov/camping/campgrounds/234489
-            "campsite_type_of_use:Overnight",
-        ]
-    }
+    logger.info(
+        "Fetching {} facility IDs from the Recreation.gov search tool".format(
+            campsite_type
+        )
+    )
+
+    SEARCH_URL = config.RECREATION_GOV_BASE_URL + "/api/search"
     # Programmatic requests without a browser-looking User Agent
     # string will receive `403` responses
     SEARCH_HEADERS = {
         "User-Agent": "Mozilla/5.0 (Windows NT 6.1; Win64; x64; rv:47.0) Gecko/20100101 Firefox/47.0"
     }
 
-    response = requests.get(SEARCH_URL, params=SEARCH_PARAMS, headers=SEARCH_HEADERS)
-    data = json.loads(response.content)
-    facility_ids = [result["entity_id"] for result in data["results"]]
+    facility_ids = []
+    start = 0
+    while True:
+        search_params = {
+            # The `fq` parameter key is used twice, which is allowed
+            "fq": [
+                "campsite_type:{}".format(campsite_type),
+                # Exclude non-camping overlook locations, such as
+                # https://www.recreation.gov/camping/campgrounds/234489
+                "campsite_type_of_use:Overnight",
+            ],
+            "start": start,
+            "size": config.SEARCH_PAGE_SIZE,
+        }
+        get_host_rate_limiter(SEARCH_URL).acquire()
+        response = http_client.get(
+            SEARCH_URL, params=search_params, headers=SEARCH_HEADERS
+        )
+        response.raise_for_status()
+        data = json.loads(response.content)
+        results = data.get("results") or []
+        facility_ids += [result["entity_id"] for result in results]
+
+        start += len(results)
+        if not results or start >= data["total"]:
+            break
 
     logger.info("Found {} IDs".format(len(facility_ids)))
     return facility_ids
@@ -120,20 +236,47 @@ def get_manually_excluded_ids():
 
 
 if __name__ == "__main__":
-    # Write all facility IDs to a single, newline-delimited file
-    facility_ids = set(
-        get_manually_entered_ids()
-        + get_firelookoutorg_ids()
-        + get_recreationgov_search_ids()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--campsite-types",
+        type=lambda types: types.split(","),
+        default=config.CAMPSITE_TYPES,
+        help="Comma-separated campsite types to find facilities for",
+    )
+    parser.add_argument(
+        "--output",
+        default=os.path.join(sys.path[0], "compiled_facility_ids.txt"),
+        help="Where to write the newline-delimited facility IDs",
     )
+    args = parser.parse_args()
 
-    for id_ in get_manually_excluded_ids():
-        try:
-            facility_ids.remove(id_)
-        except KeyError:
-            logger.info("Blacklisted ID {} not found in the compiled list".format(id_))
+    facility_ids = set()
+    for campsite_type in args.campsite_types:
+        if campsite_type == "LOOKOUT":
+            # Lookouts are also gathered from other lists, since not all of
+            # them are tagged as such on Recreation.gov
+            lookout_ids = set(
+                get_manually_entered_ids()
+                + get_firelookoutorg_ids()
+                + get_recreationgov_search_ids(campsite_type)
+            )
+            for id_ in get_manually_excluded_ids():
+                try:
+                    lookout_ids.remove(id_)
+                except KeyError:
+                    logger.info(
+                        "Blacklisted ID {} not found in the compiled list".format(id_)
+                    )
+            facility_ids |= lookout_ids
+        else:
+            facility_ids |= set(get_recreationgov_search_ids(campsite_type))
 
-    with open(os.path.join(sys.path[0], "compiled_facility_ids.txt"), "w") as file:
+    with open(args.output, "w") as file:
         # Sort the facility IDs so that it's easier to read
         # git diffs when the list changes
         file.write("\n".join(sorted(facility_ids)))
+
+    logger.info(
+        "Made {request_count} requests over {connection_count} connections, "
+        "{tls_handshake_count} of them with TLS".format(**http_client.get_stats())
+    )
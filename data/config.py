@@ -1,6 +1,139 @@
+import os
+
 SECONDS_BETWEEN_REQUESTS = 1
 MAX_REQUESTS_PER_SECOND = 1 / SECONDS_BETWEEN_REQUESTS
 REQUEST_TIMEOUT_SECONDS = 2
+# Requests go through a shared client (see `http_client.py`), which keeps
+# connections alive to this many hosts at once, and up to this many
+# connections to each. Requests to Recreation.gov's API give up after
+# these many seconds to connect, and to wait between bytes of a response.
+HTTP_POOL_HOST_COUNT = 16
+HTTP_POOL_SIZE = 8
+API_TIMEOUT_SECONDS = (5, 30)
+# Where to send API requests. Set the `RECREATION_GOV_BASE_URL`
+# environment variable to point the scrapers elsewhere, such as at
+# `stand_in_server.py`
+RECREATION_GOV_BASE_URL = os.environ.get(
+    'RECREATION_GOV_BASE_URL', 'https://www.recreation.gov'
+)
 # recreation.gov responds with `403` errors unless the user agent string
 # is spoofed to look like a GUI web browser
 FAKE_USER_AGENT_HEADER = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:10.0) Gecko/20100101 Firefox/10.0'}
+# How many facilities to scrape at once. Requests are still bound by
+# `MAX_REQUESTS_PER_SECOND` overall, but running several facilities
+# concurrently lets each request's network latency overlap with others'
+MAX_CONCURRENT_FACILITIES = 4
+# How long recreation.gov responses are cached on disk between runs, in
+# seconds. The first URL pattern to match applies, and responses that
+# match no pattern (or have a TTL of `0`) are always fetched fresh.
+# Availability changes by the hour, but the rest of the data only
+# changes every season or so. The `rolling` tier's full refreshes check
+# cached responses with the server regardless of their age.
+CACHE_DIRECTORY = 'http_cache'
+CACHE_TTLS = [
+    (r'/api/camps/availability/', 0),
+    (r'/api/', 60 * 60 * 24 * 7),
+]
+# Cache entries that haven't been revalidated within this many seconds
+# are deleted at the start of a run
+CACHE_MAX_AGE_SECONDS = 60 * 60 * 24 * 30
+# Each finished facility is appended to this journal file. A run started
+# with `--resume` skips the facilities already journaled, as long as the
+# journaled run began within the window.
+JOURNAL_FILE_NAME = 'availability_journal.jsonl'
+JOURNAL_RUN_WINDOW_SECONDS = 60 * 60 * 12
+# Facilities that fail during the main pass are retried at the end of
+# the run, for up to this many seconds in total. Any that still fail are
+# listed in the failures file, and their record from the previous run's
+# output is carried forward.
+RETRY_TIME_BUDGET_SECONDS = 60 * 5
+FAILURES_FILE_NAME = 'failed_facilities.json'
+# Recreation.gov's throttling threshold isn't published, and seems to
+# differ between endpoints. So, the request rate for each family of
+# endpoints is learned as the scraper runs, starting from
+# `MAX_REQUESTS_PER_SECOND`: each healthy response increases the rate
+# slightly, and each throttled response cuts it. Learned rates are saved
+# between runs. The first URL pattern to match decides the family.
+ENDPOINT_FAMILIES = [
+    ('availability', r'/api/camps/availability/'),
+    ('metadata', r'/api/camps/'),
+    ('search', r'/api/search'),
+    ('ratingreview', r'/api/ratingreview/'),
+    ('media', r'/api/media/'),
+]
+MIN_LEARNED_REQUESTS_PER_SECOND = 0.1
+MAX_LEARNED_REQUESTS_PER_SECOND = 5
+RATE_ADDITIVE_INCREASE = 0.01
+RATE_MULTIPLICATIVE_DECREASE = 0.5
+# Recreation.gov throttles each client as a whole, so however fast the
+# families' learned rates allow, all requests together are held to this
+# rate. A family can only speed up into whatever the others leave unused.
+MAX_TOTAL_REQUESTS_PER_SECOND = MAX_REQUESTS_PER_SECOND
+LEARNED_RATES_FILE_NAME = 'learned_rates.json'
+# Under the `rolling` refresh tier, each facility's static data (metadata,
+# attributes, cell coverage) is re-scraped once every this many days,
+# while availability is refreshed on every run
+ROLLING_REFRESH_DAYS = 7
+# Large responses, like availability, are parsed in chunks of this size
+# as they stream in
+STREAM_CHUNK_SIZE_BYTES = 64 * 1024
+# When compiling facility IDs, links are resolved this many at a time,
+# with each host still limited to `MAX_REQUESTS_PER_SECOND`. Resolved
+# links are saved, so that they're never resolved again.
+MAX_CONCURRENT_LINK_RESOLUTIONS = 8
+MAX_REDIRECTS = 10
+RESOLVED_LINKS_FILE_NAME = 'resolved_links.json'
+# Counts and timings of each run's requests are written to this file,
+# next to the output; `--profile` also writes cProfile stats
+RUN_METRICS_FILE_NAME = 'run_metrics.json'
+PROFILE_FILE_NAME = 'run_profile.prof'
+# Which types of campsite to discover and scrape. Set the
+# `CAMPSITE_TYPES` environment variable to a comma-separated list to
+# widen the catalog, eg `LOOKOUT,CABIN NONELECTRIC,CABIN ELECTRIC,YURT`.
+# Discovery pages through the search results for each type; before
+# scraping facilities one at a time, their attributes are gathered in
+# bulk the same way, and facilities that aren't found are queried
+# individually. Only a facility's campsites of these types are scraped,
+# unless it has none of them, such as a manually-entered facility.
+CAMPSITE_TYPES = os.environ.get('CAMPSITE_TYPES', 'LOOKOUT').split(',')
+SEARCH_PAGE_SIZE = 100
+# Each facility's campsite IDs, types, and accessibility are kept in this
+# file between runs, and only looked up again once they're this old
+CAMPSITE_MAP_FILE_NAME = 'campsite_map.json'
+CAMPSITE_MAP_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+# With `--shard i/N`, each shard's output is written to this file instead
+# of `availability.json`, for `merge_shards.py` to combine
+SHARD_OUTPUT_FILE_NAME = 'availability.shard-{index}-of-{count}.json'
+# With `--time-budget`, this many seconds are kept in reserve to write the
+# output. Until some have been timed, refreshing a facility's availability,
+# or everything about it, is assumed to take this long.
+TIME_BUDGET_RESERVE_SECONDS = 60
+DEFAULT_AVAILABILITY_REFRESH_SECONDS = 5
+DEFAULT_FULL_REFRESH_SECONDS = 30
+# The bulk harvest of campsites only saves a request per facility, so
+# under a time budget it only gets this share of it, and is given up on
+# (in favour of querying each facility) if it doesn't finish in time.
+# It isn't started at all unless it has at least this many seconds.
+HARVEST_TIME_BUDGET_FRACTION = 0.25
+DEFAULT_HARVEST_SECONDS = 60
+# `watch_availability.py` polls the facilities listed in this file, and
+# keeps what it last saw of each in the state file. Each facility's
+# polling interval is halved whenever its availability changes, and
+# lengthened while it doesn't, within these bounds; facilities watched
+# for nights within `WATCH_NEAR_TERM_DAYS` have a lower upper bound.
+WATCHLIST_FILE_NAME = 'watchlist.json'
+WATCH_STATE_FILE_NAME = 'watch_state.json'
+WATCH_MIN_POLL_INTERVAL_SECONDS = 60
+WATCH_MAX_POLL_INTERVAL_SECONDS = 30 * 60
+WATCH_NEAR_TERM_DAYS = 14
+WATCH_NEAR_TERM_MAX_POLL_INTERVAL_SECONDS = 5 * 60
+WATCH_POLL_INTERVAL_DECREASE = 0.5
+WATCH_POLL_INTERVAL_INCREASE = 1.5
+# Every night whose availability changed since the last run is saved to
+# this SQLite database, to build up a history of bookings and cancellations
+HISTORY_FILE_NAME = 'availability_history.sqlite'
+# `publish_deltas.py` publishes each new version of the output as a patch
+# against the previous one, listed in the manifest file, and publishes a
+# full snapshot instead once every this many versions
+MANIFEST_FILE_NAME = 'manifest.json'
+PUBLISH_SNAPSHOT_INTERVAL = 24
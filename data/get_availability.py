@@ -1,18 +1,36 @@
 #! /usr/bin/env python3
 
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import cProfile
 import datetime
+import functools
 from dateutil.relativedelta import relativedelta
 import json
 import logging
 import os
 import sys
 import re
+import threading
+import time
+import zlib
 
 from backoff import on_exception, expo
-from ratelimit import limits, sleep_and_retry
 import requests
 
+from availability_encoding import decode_record, encode_record
+from cache import ResponseCache
+from campsite_map import CampsiteMap
 import config
+from journal import RunJournal
+from history import AvailabilityHistory
+from http_client import HttpClient
+from metrics import RunMetrics
+from projection import Derive, Drop, Keep, Projection, WarningCounter
+from output_formats import write_artifacts
+from scheduler import DeadlineScheduler
+from streaming import iter_object_items
+from throttle import AdaptiveRateLimiter
 
 
 logger = logging.getLogger(__file__)
@@ -23,8 +41,44 @@ logger.setLevel(logging.INFO)
 # Recreation.gov throws a 403 error if too many requests are
 # made. Respect this by rate-limiting this module's requests,
 # and waiting before retrying upon a 403 error. Especially
-# common for the availability endpoint.
+# common for the availability endpoint. Facilities are scraped
+# by several worker threads at once, so that request latency
+# overlaps instead of stacking up; they all share this limiter,
+# which learns a safe rate for each family of endpoints, within one
+# overall limit.
+rate_limiter = AdaptiveRateLimiter(
+    config.ENDPOINT_FAMILIES,
+    initial_rate=config.MAX_REQUESTS_PER_SECOND,
+    min_rate=config.MIN_LEARNED_REQUESTS_PER_SECOND,
+    max_rate=config.MAX_LEARNED_REQUESTS_PER_SECOND,
+    additive_increase=config.RATE_ADDITIVE_INCREASE,
+    multiplicative_decrease=config.RATE_MULTIPLICATIVE_DECREASE,
+    total_rate=config.MAX_TOTAL_REQUESTS_PER_SECOND,
+)
+
+# Where the run's time goes, and how many requests it makes, is tallied
+# here and written out at the end of the run
+run_metrics = RunMetrics()
+
+# Most of the data changes rarely, so avoid re-requesting it every run
+response_cache = ResponseCache(
+    os.path.join(sys.path[0], config.CACHE_DIRECTORY),
+    config.CACHE_TTLS,
+    config.CACHE_MAX_AGE_SECONDS,
+)
+
+# Every request shares this client's pool of keep-alive connections
+http_client = HttpClient(
+    config.API_TIMEOUT_SECONDS, config.HTTP_POOL_HOST_COUNT, config.HTTP_POOL_SIZE
+)
+
+# Which campsites belong to each facility is effectively static, so it's
+# kept between runs instead of being looked up for every facility
+campsite_map = CampsiteMap(config.CAMPSITE_MAP_MAX_AGE_SECONDS)
+
+
 def backoff_handler(details):
+    run_metrics.record_backoff(details["wait"])
     logger.info(
         "Recreation.gov returned a 403 error; going to try again after {wait:0.1f} more seconds".format(
             **details
@@ -32,23 +86,119 @@ def backoff_handler(details):
     )
 
 
-@sleep_and_retry
-@limits(calls=config.MAX_REQUESTS_PER_SECOND, period=1)
+def get_json_rate_limited(
+    url, headers=None, parse_stream=None, revalidate=False, **kwargs
+):
+    """
+    Request a URL and return its parsed JSON body. If `parse_stream` is
+    given, the body is instead streamed, and its chunks of bytes are
+    passed to that function to parse. With `revalidate`, a cached
+    response is checked with the server even if it's still fresh. If the
+    URL is already being requested by another thread, its result is
+    shared instead of making the request again (so any callers streaming
+    the same URL must parse it the same way).
+    """
+    return http_client.coalesce(
+        (url, revalidate),
+        lambda: fetch_json_rate_limited(
+            url,
+            headers=headers,
+            parse_stream=parse_stream,
+            revalidate=revalidate,
+            **kwargs,
+        ),
+    )
+
+
 @on_exception(
     expo,
     requests.exceptions.JSONDecodeError,
     max_time=60 * 5,
     on_backoff=backoff_handler,
 )
-def get_json_rate_limited(*args, **kwargs):
-    logger.debug(f"Making a request to {args[0]}")
-    response = requests.get(*args, **kwargs)
-    return response.json()
+def fetch_json_rate_limited(
+    url, headers=None, parse_stream=None, revalidate=False, **kwargs
+):
+    endpoint = rate_limiter.get_family(url)
+
+    cached = response_cache.lookup(url)
+    if cached is not None and not revalidate and response_cache.is_fresh(url, cached):
+        logger.debug(f"Using cached response for {url}")
+        run_metrics.record_cache_hit(endpoint)
+        return cached["body"]
+
+    headers = dict(headers or {})
+    if cached is not None:
+        headers.update(response_cache.get_conditional_headers(cached))
+
+    run_metrics.record_rate_limit_wait(endpoint, rate_limiter.acquire(url))
+    logger.debug(f"Making a request to {url}")
+    response = http_client.get(
+        url, headers=headers, stream=parse_stream is not None, **kwargs
+    )
+    if response.status_code == 304 and cached is not None:
+        logger.debug(f"Cached response for {url} is still valid")
+        run_metrics.record_request(endpoint, response.elapsed.total_seconds(), 0, 0)
+        run_metrics.record_not_modified(endpoint)
+        rate_limiter.on_success(url)
+        response_cache.refresh(url, cached)
+        return cached["body"]
+
+    byte_count = 0
+
+    def count_bytes(chunks):
+        nonlocal byte_count
+        for chunk in chunks:
+            byte_count += len(chunk)
+            yield chunk
+
+    # Throttled requests receive a 403 error, with an HTML body
+    decode_started_at = time.perf_counter()
+    try:
+        if parse_stream is None:
+            byte_count = len(response.content)
+            body = response.json()
+        else:
+            with response:
+                chunks = count_bytes(
+                    response.iter_content(config.STREAM_CHUNK_SIZE_BYTES)
+                )
+                body = parse_stream(chunks)
+                # Read the rest of the body before the response is
+                # closed, since closing it part-way through drops its
+                # connection, and the next request would have to open
+                # another one
+                for _ in chunks:
+                    pass
+    except requests.exceptions.JSONDecodeError:
+        run_metrics.record_throttled(endpoint)
+        logger.debug(
+            "Slowed requests to the {} endpoints to {:.2f} per second".format(
+                endpoint, rate_limiter.on_throttled(url)
+            )
+        )
+        raise
+    finally:
+        run_metrics.record_request(
+            endpoint,
+            response.elapsed.total_seconds(),
+            byte_count,
+            time.perf_counter() - decode_started_at,
+        )
+    if response.status_code == 403:
+        run_metrics.record_throttled(endpoint)
+        rate_limiter.on_throttled(url)
+    else:
+        rate_limiter.on_success(url)
+
+    if response.ok:
+        response_cache.store(url, body, response.headers)
+    return body
 
 
-def get_facility_ids():
+def get_facility_ids(path):
     """Load facility IDs from the compiled scraped list"""
-    with open(os.path.join(sys.path[0], "compiled_facility_ids.txt"), "r") as file:
+    with open(path, "r") as file:
         return file.read().split("\n")
 
 
@@ -73,13 +223,100 @@ coordinate_overrides = {
 }
 
 
-def get_facility_metadata(facility_id):
+project_campground = Projection(
+    "campground",
+    [
+        Keep("facility_id"),
+        Keep("facility_name"),
+        Keep("facility_latitude"),
+        Keep("facility_longitude"),
+        Keep("facility_description_map", required=False),
+        Keep("facility_rules", required=False),
+        Keep("facility_directions", required=False),
+        Keep("facility_email", required=False),
+        Keep("facility_phone", required=False),
+        Keep("alternate_names", required=False),
+        Keep("cancellation_description", required=False),
+        Keep("org_code", required=False),
+        Keep("parent_asset_id", required=False),
+        # Restructure or simplify complex fields
+        Keep(
+            "activities",
+            transform=lambda activities: [
+                i["activity_description"] for i in activities or []
+            ],
+        ),
+        Keep(
+            "links",
+            transform=lambda links: [
+                {"title": i["title"], "url": i["url"]} for i in links
+            ],
+        ),
+        Keep(
+            "notices",
+            transform=lambda notices: [i["notice_text"] for i in notices or []],
+            expect=lambda notices: all(
+                i["notice_type"] == "warning" for i in notices or []
+            ),
+            required=False,
+        ),
+        # Throw out unnecessary fields, mostly internal metadata
+        Drop("is_deactivated"),
+        Drop("activated_date"),
+        Drop("attributes", expect=lambda value: value is None),
+        Drop("certification_log"),
+        Drop("city"),
+        Drop("created_by"),
+        Drop("created_date"),
+        Drop("facility_time_zone"),
+        Drop("is_commercially_managed", expect=lambda value: not value),
+        Drop("facility_lookups", expect=lambda value: not value),
+        Drop("inventory_type_id", expect="3"),
+        Drop("legacy_facility_id"),
+        Drop(
+            "order_components",
+            expect={
+                "camping_equipment": True,
+                "group_leader_details": True,
+                "group_size": True,
+                "num_vehicles": True,
+                "pass": True,
+            },
+        ),
+        Drop("org_id"),
+        Drop("receipt_autoprint"),
+        Drop("receipt_custom_text"),
+        Drop("state"),
+        Drop("updated_by"),
+        Drop("updated_date"),
+        # Throw out fields that are predicable or duplicative
+        # Address is just the ranger station's address
+        Drop("addresses"),
+        Drop("amenities"),
+        Drop("facility_adaaccess", expect=lambda value: value != "Y"),
+        Drop("facility_map_url", expect=lambda value: not value),
+        Drop("facility_reservation_url", expect=lambda value: not value),
+        Drop("facility_type", expect="STANDARD"),
+        Drop("facility_use_fee_description"),
+        Drop("fee_model", expect=1),
+        Drop("stay_limit", expect=""),
+    ],
+    # Fields that nobody has looked at yet are still published
+    keep_unexpected=True,
+)
+
+
+@run_metrics.timed
+def get_facility_metadata(facility_id, revalidate=False):
     """Fetch metadata for a particular campground"""
-    METADATA_URL = "https://www.recreation.gov/api/camps/campgrounds/{facility_id}"
+    METADATA_URL = (
+        config.RECREATION_GOV_BASE_URL + "/api/camps/campgrounds/{facility_id}"
+    )
 
     facility_metadata = get_json_rate_limited(
         METADATA_URL.format(facility_id=facility_id),
         headers=config.FAKE_USER_AGENT_HEADER,
+        revalidate=revalidate,
     )
     if "campground" not in facility_metadata:
         logger.error(
@@ -97,81 +334,8 @@ def get_facility_metadata(facility_id):
             )
         )
         return None
-    else:
-        del campground_metadata["is_deactivated"]
-        logger.debug(
-            "Found metadata for {}".format(campground_metadata["facility_name"])
-        )
-
-    # Throw out unnecessary fields, mostly internal metadata
-    del campground_metadata["activated_date"]
-    assert campground_metadata["attributes"] is None
-    del campground_metadata["attributes"]
-    del campground_metadata["certification_log"]
-    del campground_metadata["city"]
-    del campground_metadata["created_by"]
-    del campground_metadata["created_date"]
-    del campground_metadata["facility_time_zone"]
-    assert not campground_metadata["is_commercially_managed"]
-    del campground_metadata["is_commercially_managed"]
-    assert not campground_metadata["facility_lookups"]
-    del campground_metadata["facility_lookups"]
-    assert campground_metadata["inventory_type_id"] == "3"
-    del campground_metadata["inventory_type_id"]
-    if "legacy_facility_id" in campground_metadata:
-        del campground_metadata["legacy_facility_id"]
-    assert campground_metadata["order_components"] == {
-        "camping_equipment": True,
-        "group_leader_details": True,
-        "group_size": True,
-        "num_vehicles": True,
-        "pass": True,
-    }
-    del campground_metadata["order_components"]
-    del campground_metadata["org_id"]
-    del campground_metadata["receipt_autoprint"]
-    del campground_metadata["receipt_custom_text"]
-    del campground_metadata["state"]
-    del campground_metadata["updated_by"]
-    del campground_metadata["updated_date"]
-
-    # Throw out fields that are predicable or duplicative
-    # Address is just the ranger station's address
-    del campground_metadata["addresses"]
-    if "amenities" in campground_metadata:
-        del campground_metadata["amenities"]
-    assert campground_metadata["facility_adaaccess"] != "Y"
-    del campground_metadata["facility_adaaccess"]
-    assert not campground_metadata["facility_map_url"]
-    del campground_metadata["facility_map_url"]
-    assert not campground_metadata["facility_reservation_url"]
-    del campground_metadata["facility_reservation_url"]
-    assert campground_metadata["facility_type"] == "STANDARD"
-    del campground_metadata["facility_type"]
-    del campground_metadata["facility_use_fee_description"]
-    assert campground_metadata["fee_model"] == 1
-    del campground_metadata["fee_model"]
-    assert campground_metadata["stay_limit"] == ""
-    del campground_metadata["stay_limit"]
-
-    # Restructure or simplify complex fields
-    campground_metadata["activities"] = (
-        [i["activity_description"] for i in campground_metadata["activities"]]
-        if campground_metadata["activities"]
-        else []
-    )
-    campground_metadata["links"] = [
-        {"title": i["title"], "url": i["url"]} for i in campground_metadata["links"]
-    ]
-    if "notices" in campground_metadata:
-        assert all(
-            [i["notice_type"] == "warning" for i in campground_metadata["notices"]]
-        )
-        campground_metadata["notices"] = (
-            [i["notice_text"] for i in campground_metadata["notices"]]
-            if campground_metadata["notices"]
-            else []
-        )
+    logger.debug("Found metadata for {}".format(campground_metadata["facility_name"]))
+    campground_metadata = project_campground(campground_metadata)
 
     # Provide the geographic coordinates for a few shelters that are
     # missing those values
@@ -188,6 +352,7 @@ def get_facility_metadata(facility_id):
     return campground_metadata
 
 
+@run_metrics.timed
 def get_campsite_availability(campsite_id):
     """Fetch which days a campsite is available for booking"""
 
@@ -207,31 +372,35 @@ def get_campsite_availability(campsite_id):
     # The booking window is typically only 6 months into the future
     look_until = datetime.date.today() + relativedelta(months=6, days=1)
 
-    availabilities = {}
-
-    availability_url = (
-        f"https://www.recreation.gov/api/camps/availability/campsite/{campsite_id}/all"
-    )
-    data = get_json_rate_limited(
-        availability_url, headers=config.FAKE_USER_AGENT_HEADER
-    )["availability"]["availabilities"]
-    if data:
-        availabilities = {
+    def parse_availabilities(chunks):
+        # This endpoint's response can be large, so parse it as it streams
+        # in, rather than holding the whole thing in memory
+        return {
             # Truncate the time component off of the timestamp, and determine
             # whether a site is available on a given night
             k.replace("T00:00:00Z", ""): (v not in NOT_AVAIALABLE_CODES)
-            for k, v in data.items()
+            for k, v in iter_object_items(chunks, "availabilities")
             # Also, since this endpoint responds with months waaaaaay in the
             # future (where the availability will always be `NYR`), truncate
             # those superfluous months so the output JSON is more managable
             if not (k > look_until.isoformat() and v in NOT_AVAIALABLE_CODES)
         }
+
+    availability_url = f"{config.RECREATION_GOV_BASE_URL}/api/camps/availability/campsite/{campsite_id}/all"
+    availabilities = get_json_rate_limited(
+        availability_url,
+        headers=config.FAKE_USER_AGENT_HEADER,
+        parse_stream=parse_availabilities,
+    )
     return availabilities or None
 
 
+@run_metrics.timed
 def get_facility_rate(facility_id):
     """Get the nightly rate for the facility"""
-    RATE_URL = "https://www.recreation.gov/api/camps/campgrounds/{facility_id}/rates"
+    RATE_URL = (
+        config.RECREATION_GOV_BASE_URL + "/api/camps/campgrounds/{facility_id}/rates"
+    )
 
     logger.debug("Querying rate for facility {}".format(facility_id))
     rate = get_json_rate_limited(
@@ -251,14 +420,19 @@ def get_facility_rate(facility_id):
     return nightly_rate
 
 
-def get_cell_coverage(facility_id):
+@run_metrics.timed
+def get_cell_coverage(facility_id, revalidate=False):
     """Get the aggregated ratings of cell coverage by reviewers"""
-    CELL_COVERAGE_URL = "https://www.recreation.gov/api/ratingreview/aggregate?location_type=Campground&location_id={facility_id}"
+    CELL_COVERAGE_URL = (
+        config.RECREATION_GOV_BASE_URL
+        + "/api/ratingreview/aggregate?location_type=Campground&location_id={facility_id}"
+    )
 
     logger.debug("Querying cell coverage for facility {}".format(facility_id))
     cell_coverage = get_json_rate_limited(
         CELL_COVERAGE_URL.format(facility_id=facility_id),
         headers=config.FAKE_USER_AGENT_HEADER,
+        revalidate=revalidate,
     )
 
     if (
@@ -270,9 +444,27 @@ def get_cell_coverage(facility_id):
         return cell_coverage["aggregate_cell_coverage_ratings"]
 
 
+project_image = Projection(
+    "image",
+    [
+        Keep("mime_type"),
+        Keep("height", transform=int),
+        Keep("width", transform=int),
+        Keep("url"),
+        Derive(
+            "description",
+            lambda image: image["description"] or image["title"],
+            sources=["description", "title"],
+        ),
+        Keep("credits"),
+    ],
+)
+
+
+@run_metrics.timed
 def get_images(facility_id):
     """Get media of the location and its views"""
-    IMAGE_URL = "https://www.recreation.gov/api/media/public/asset/{facility_id}"
+    IMAGE_URL = config.RECREATION_GOV_BASE_URL + "/api/media/public/asset/{facility_id}"
 
     logger.debug("Querying cell coverage for facility {}".format(facility_id))
     images = get_json_rate_limited(
@@ -282,36 +474,109 @@ def get_images(facility_id):
     if not images or "result" not in images:
         return None
     else:
-        images_with_minimal_info = []
-        for image in images["result"]:
-            images_with_minimal_info.append(
-                {
-                    "mime_type": image["mime_type"],
-                    "height": int(image["height"]),
-                    "width": int(image["width"]),
-                    "url": image["url"],
-                    "description": image["description"] or image["title"],
-                    "credits": image["credits"],
-                }
+        return [project_image(image) for image in images["result"]]
+
+
+# Campsites' search results, keyed by their facility ID, as gathered in
+# bulk by `harvest_campsites`
+harvested_campsites = {}
+
+
+def harvest_campsites(campsite_types, revalidate=False, deadline=None):
+    """
+    Page through the campsite search results for each of the given
+    campsite types, collecting each campsite's search result (including
+    its attributes) by facility ID. This takes a handful of requests,
+    instead of one per facility. Returns `None` if the `time.monotonic()`
+    deadline passes first, since a facility's campsites may be spread
+    across pages that weren't reached.
+    """
+    SEARCH_URL = (
+        config.RECREATION_GOV_BASE_URL
+        + "/api/search/campsites?fq=campsite_type:{campsite_type}&start={start}&size={size}"
+    )
+
+    campsites_by_facility = {}
+    for campsite_type in campsite_types:
+        start = 0
+        while True:
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            logger.debug(
+                "Harvesting {} campsites from result {}".format(campsite_type, start)
             )
+            page = get_json_rate_limited(
+                SEARCH_URL.format(
+                    campsite_type=campsite_type,
+                    start=start,
+                    size=config.SEARCH_PAGE_SIZE,
+                ),
+                headers=config.FAKE_USER_AGENT_HEADER,
+                revalidate=revalidate,
+            )
+            campsites = page.get("campsites") or []
+            for campsite in campsites:
+                campsites_by_facility.setdefault(campsite["asset_id"], []).append(
+                    campsite
+                )
 
-        return images_with_minimal_info
+            start += len(campsites)
+            if not campsites or start >= page["total"]:
+                break
+
+    logger.info(
+        "Harvested campsites for {} facilities from search results".format(
+            len(campsites_by_facility)
+        )
+    )
+    return campsites_by_facility
 
 
-def get_attributes(facility_id):
-    """Get campground amenities and details"""
+IGNORED_ATTRIBUTES = frozenset(
+    [
+        "Map X Coordinate",
+        "Map Y Coordinate",
+        "Placed on Map",
+        "Base Number of People",
+        "Base Number of Vehicles",
+    ]
+)
+DETAIL_ATTRIBUTE_CATEGORIES = frozenset(["site_details", "equipment_details"])
+attribute_warnings = WarningCounter()
+
+
+@run_metrics.timed
+def get_attributes(facility_id, campsite_ids, revalidate=False):
+    """
+    Get campground amenities and details. A facility with several
+    campsites takes its details from the first of them, and lists the
+    amenities that any of them have
+    """
     ATTRIBUTE_URL = (
-        "https://www.recreation.gov/api/search/campsites?fq=asset_id:{facility_id}"
+        config.RECREATION_GOV_BASE_URL
+        + "/api/search/campsites?fq=asset_id:{facility_id}&size={size}"
     )
 
-    logger.debug("Querying attributes for facility {}".format(facility_id))
-    attributes = get_json_rate_limited(
-        ATTRIBUTE_URL.format(facility_id=facility_id),
-        headers=config.FAKE_USER_AGENT_HEADER,
-    )
+    # Only query facilities that weren't found by the bulk harvest
+    if facility_id in harvested_campsites:
+        attributes = {
+            "total": len(harvested_campsites[facility_id]),
+            "campsites": harvested_campsites[facility_id],
+        }
+    else:
+        logger.debug("Querying attributes for facility {}".format(facility_id))
+        attributes = get_json_rate_limited(
+            ATTRIBUTE_URL.format(facility_id=facility_id, size=config.SEARCH_PAGE_SIZE),
+            headers=config.FAKE_USER_AGENT_HEADER,
+            revalidate=revalidate,
+        )
 
-    assert attributes["total"] < 2
-    if attributes["total"] == 0 or "campsites" not in attributes:
+    campsites = [
+        campsite
+        for campsite in attributes.get("campsites") or []
+        if campsite["campsite_id"] in campsite_ids
+    ]
+    if not campsites:
         return None
     else:
         data = {
@@ -319,151 +584,808 @@ def get_attributes(facility_id):
             "amenities": [],
         }
 
-        for attribute in attributes["campsites"][0]["attributes"]:
+        for attribute in campsites[0]["attributes"]:
             category = attribute["attribute_category"]
             name = attribute["attribute_name"]
+            if name in IGNORED_ATTRIBUTES:
+                continue
             value = parse_attribute_string(attribute["attribute_value"])
 
-            FIELDS_TO_IGNORE = [
-                "Map X Coordinate",
-                "Map Y Coordinate",
-                "Placed on Map",
-                "Base Number of People",
-                "Base Number of Vehicles",
-            ]
-
-            if name in FIELDS_TO_IGNORE:
-                continue
-            elif category == "site_details":
-                data["details"][name] = value
-            elif category == "equipment_details":
+            if category in DETAIL_ATTRIBUTE_CATEGORIES:
                 data["details"][name] = value
             elif category == "amenities":
-                if name == value or (type(value) is bool and value):
+                if is_amenity(name, value):
                     data["amenities"].append(name)
                 else:
                     data["details"][name] = value
             else:
-                raise ValueError(
-                    "Found unexpected attribute category: {}".format(category)
+                attribute_warnings.warn(
+                    category,
+                    "Found unexpected attribute category `{}`; skipping it".format(
+                        category
+                    ),
                 )
 
+        for campsite in campsites[1:]:
+            for attribute in campsite["attributes"]:
+                name = attribute["attribute_name"]
+                if (
+                    attribute["attribute_category"] == "amenities"
+                    and name not in data["amenities"]
+                    and is_amenity(
+                        name, parse_attribute_string(attribute["attribute_value"])
+                    )
+                ):
+                    data["amenities"].append(name)
+
         return data
 
 
+def is_amenity(name, value):
+    """Whether an amenity attribute says the campsite has that amenity"""
+    return name == value or (type(value) is bool and value)
+
+
+INTEGER_PATTERN = re.compile(r"^\d+$")
+FLOAT_PATTERN = re.compile(r"^\d+\.\d+$")
+TRUE_STRINGS = frozenset(["Yes", "Y", "true"])
+FALSE_STRINGS = frozenset(["No", "N", "false"])
+
+
 def parse_attribute_string(string):
     value = string.strip()
 
-    if re.match(r"^\d+$", string):
+    if INTEGER_PATTERN.match(string):
         value = int(string)
-    elif re.match(r"^\d+\.\d+$", string):
+    elif FLOAT_PATTERN.match(string):
         value = float(string)
-    elif string == "Yes" or string == "Y" or string == "true":
+    elif string in TRUE_STRINGS:
         value = True
-    elif string == "No" or string == "N" or string == "false":
+    elif string in FALSE_STRINGS:
         value = False
 
     return value
 
 
-def get_campsite_id(facility_id):
+@run_metrics.timed
+def get_campsite_ids(facility_id, revalidate=False):
+    """Get the IDs of all of the campsites in the campground/facility"""
+
+    campsites_url = f"{config.RECREATION_GOV_BASE_URL}/api/camps/campgrounds/{facility_id}/campsites"
+    campsite_infos = get_json_rate_limited(
+        campsites_url, headers=config.FAKE_USER_AGENT_HEADER, revalidate=revalidate
+    )["campsites"]
+    return [campsite_info["campsite_id"] for campsite_info in campsite_infos]
+
+
+project_campsite = Projection(
+    "campsite",
+    [
+        Keep("campsite_id"),
+        Keep("is_accessible"),
+        # This will show whether the site has electricity
+        Keep("campsite_type"),
+        # In the future, might be worthwhile to fetch the `campsite_longitude`
+        # and `campsite_latitude` and see if they're more accurate than the
+        # facility's value. Could also be nice to grab a list of all the
+        # provided equipment/offerings.
+    ],
+)
+
+
+@run_metrics.timed
+def get_campsite_metadata(campsite_id, revalidate=False):
+    """
+    Fetch a few additional metadata fields that can't be retrieved from
+    the facility metadata response
+    """
+
+    campsite_url = f"{config.RECREATION_GOV_BASE_URL}/api/camps/campsites/{campsite_id}"
+    data = get_json_rate_limited(
+        campsite_url, headers=config.FAKE_USER_AGENT_HEADER, revalidate=revalidate
+    )["campsite"]
+    return project_campsite(data)
+
+
+def get_campsites(facility_id, revalidate=False):
+    """
+    Get the metadata of each of a facility's campsites, from the campsite
+    map if possible, since it hardly ever changes. With `revalidate`, the
+    map is bypassed, and the campsites are looked up again.
+    """
+    campsites = None if revalidate else campsite_map.get(facility_id)
+    if campsites is None:
+        campsites = [
+            get_campsite_metadata(campsite_id, revalidate=revalidate)
+            for campsite_id in get_campsite_ids(facility_id, revalidate=revalidate)
+        ]
+        campsite_map.set(facility_id, campsites)
+
+    # Campgrounds can mix campsite types, eg tent sites alongside a yurt
+    return [
+        campsite
+        for campsite in campsites
+        if campsite["campsite_type"] in config.CAMPSITE_TYPES
+    ] or campsites
+
+
+def get_combined_campsite_metadata(campsites):
+    """
+    Merge several campsites' metadata into the output record's fields.
+    A facility with a single campsite keeps that campsite's metadata
+    as-is; one with several also lists all of their IDs
+    """
+    metadata = dict(campsites[0])
+    if len(campsites) > 1:
+        metadata["campsite_ids"] = [c["campsite_id"] for c in campsites]
+        metadata["is_accessible"] = any(c["is_accessible"] for c in campsites)
+    return metadata
+
+
+def get_facility_availability(campsite_ids):
+    """
+    Fetch which nights any of a facility's campsites are available for
+    booking
+    """
+    availabilities = [get_campsite_availability(i) for i in campsite_ids]
+    if all(a is None for a in availabilities):
+        return None
+
+    availability = {}
+    for campsite_availability in availabilities:
+        for night, is_available in (campsite_availability or {}).items():
+            availability[night] = availability.get(night, False) or is_available
+    return dict(sorted(availability.items()))
+
+
+def get_record(facility_id, facilities_on_stilts, revalidate=False):
     """
-    Assuming there's only one campsite in the campground/facility, get
-    its campsite ID
+    Scrape all of the output information for a single facility. With
+    `revalidate`, nothing is taken from the response cache or the
+    campsite map without first checking that it's still current.
     """
+    metadata = get_facility_metadata(facility_id, revalidate=revalidate)
+    if metadata is None:
+        logger.info(
+            "Found no metadata for facility ID {}; skipping".format(facility_id)
+        )
+        return None
+    logger.info("Fetching information for {}".format(metadata["facility_name"].title()))
+
+    campsites = get_campsites(facility_id, revalidate=revalidate)
+    if not campsites:
+        logger.info(f'Found no campsites for {metadata["facility_name"]}; skipping')
+        return None
+
+    # Since they're not yet being used on the front-end, skip scraping
+    # images and rate. We're already being rate-limited by the
+    # Recreation.gov API, so decreasing the number of overall requests is
+    # a good idea.
+    record = {
+        "metadata": {**metadata, **get_combined_campsite_metadata(campsites)},
+        "attributes": get_attributes(
+            facility_id,
+            [campsite["campsite_id"] for campsite in campsites],
+            revalidate=revalidate,
+        ),
+        # 'images': get_images(facility_id),
+        "images": [],
+        "cell_coverage": get_cell_coverage(facility_id, revalidate=revalidate),
+        # 'rate': get_facility_rate(facility_id),
+        "rate": None,
+        "availability": get_facility_availability(
+            [campsite["campsite_id"] for campsite in campsites]
+        ),
+        "extras": {
+            "on_stilts": metadata["facility_id"] in facilities_on_stilts,
+        },
+    }
+    if is_probably_closed(record):
+        logger.info(
+            "Skipping probably-closed campground {}".format(metadata["facility_name"])
+        )
+        return None
+
+    return record
+
 
-    campsites_url = (
-        f"https://www.recreation.gov/api/camps/campgrounds/{facility_id}/campsites"
+def is_probably_closed(record):
+    return (
+        record["availability"] is None
+        and record["cell_coverage"] is None
+        and record["rate"] is None
     )
-    campsite_infos = get_json_rate_limited(
-        campsites_url, headers=config.FAKE_USER_AGENT_HEADER
-    )["campsites"]
 
-    assert (
-        len(campsite_infos) < 2
-    ), f"Found an unexpected number of campsites for facility ID {facility_id}"
-    if len(campsite_infos) == 0:
+
+def get_refreshed_availability_record(previous_record, facilities_on_stilts):
+    """
+    Update a record from a previous run with fresh availability, using
+    the campsite ID that was saved to it, without re-scraping anything else
+    """
+    metadata = previous_record["metadata"]
+    logger.info(
+        "Refreshing availability for {}".format(metadata["facility_name"].title())
+    )
+
+    record = {
+        **previous_record,
+        "availability": get_facility_availability(
+            metadata.get("campsite_ids", [metadata["campsite_id"]])
+        ),
+        "extras": {
+            **previous_record["extras"],
+            "on_stilts": metadata["facility_id"] in facilities_on_stilts,
+        },
+    }
+    if is_probably_closed(record):
+        logger.info(
+            "Skipping probably-closed campground {}".format(metadata["facility_name"])
+        )
         return None
+
+    return record
+
+
+def get_facility_bucket(facility_id, bucket_count, salt=""):
+    """
+    Deterministically assign a facility to one of `bucket_count` groups.
+    Groupings made for different purposes should use different `salt`s,
+    so that they're independent of one another
+    """
+    return zlib.crc32((salt + facility_id).encode("utf-8")) % bucket_count
+
+
+def parse_shard(value):
+    """Parse a `--shard` argument like `2/4` into `(2, 4)`"""
+    match = re.fullmatch(r"(\d+)/(\d+)", value)
+    if match is None:
+        raise argparse.ArgumentTypeError(
+            "Shards must be given as `i/N`, eg `2/4`: {}".format(value)
+        )
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(
+            "Shard index must be between 1 and the shard count: {}".format(value)
+        )
+    return index, count
+
+
+def is_in_shard(facility_id, shard):
+    index, count = shard
+    return get_facility_bucket(facility_id, count, salt="shard") == index - 1
+
+
+def get_shard_output_file_name(shard):
+    return config.SHARD_OUTPUT_FILE_NAME.format(index=shard[0], count=shard[1])
+
+
+def write_output(path, records, legacy_format):
+    with open(path, "w") as f:
+        if legacy_format:
+            json.dump(records, f, indent=4)
+        else:
+            json.dump(
+                [encode_record(record) for record in records],
+                f,
+                separators=(",", ":"),
+            )
+
+
+def is_due_for_full_refresh(facility_id, tier, previous_records):
+    """
+    Decide whether to scrape everything about a facility, or only its
+    availability, depending on the refresh tier. Under the `rolling`
+    tier, each facility is fully refreshed once every
+    `ROLLING_REFRESH_DAYS`; facilities missing from the previous run's
+    output are always fully scraped.
+    """
+    if tier == "full":
+        return True
+    elif tier == "availability":
+        return False
+    elif tier == "rolling":
+        return facility_id not in previous_records or get_facility_bucket(
+            facility_id, config.ROLLING_REFRESH_DAYS
+        ) == (datetime.date.today().toordinal() % config.ROLLING_REFRESH_DAYS)
     else:
-        return campsite_infos[0]["campsite_id"]
+        raise ValueError("Found unexpected refresh tier: {}".format(tier))
 
 
-def get_campsite_metadata(campsite_id):
+def get_change_likelihood(record):
     """
-    Fetch a few additional metadata fields that can't be retrieved from
-    the facility metadata response
+    Score how likely a facility's availability is to have changed since
+    its record was scraped, by how many upcoming nights were available.
+    Those are the nights that can be booked, whereas a booked-up facility
+    changes only as cancellations come in.
     """
+    today = datetime.date.today().isoformat()
+    return sum(
+        1
+        for night, is_available in (record["availability"] or {}).items()
+        if is_available and night >= today
+    )
 
-    fields_to_fetch = [
-        "campsite_id",
-        "is_accessible",
-        # This will show whether the site has electricity
-        "campsite_type",
-        # In the future, might be worthwhile to fetch the `campsite_longitude`
-        # and `campsite_latitude` and see if they're more accurate than the
-        # facility's value. Could also be nice to grab a list of all the
-        # provided equipment/offerings.
-    ]
 
-    campsite_url = f"https://www.recreation.gov/api/camps/campsites/{campsite_id}"
-    data = get_json_rate_limited(campsite_url, headers=config.FAKE_USER_AGENT_HEADER)[
-        "campsite"
-    ]
-    return {k: v for k, v in data.items() if k in fields_to_fetch}
+def get_previous_records(output_path):
+    """
+    Load the records from the last run's output, keyed by facility ID,
+    so they can stand in for facilities that fail during this run
+    """
+    try:
+        with open(output_path, "r") as f:
+            return {
+                record["metadata"]["facility_id"]: decode_record(record)
+                for record in json.load(f)
+            }
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--data-dir",
+        default=sys.path[0],
+        help="Where to write the output, and to keep state between runs",
+    )
+    parser.add_argument(
+        "--facility-ids-file",
+        default=os.path.join(sys.path[0], "compiled_facility_ids.txt"),
+        help="A newline-delimited file of the facility IDs to scrape",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached responses, and fetch everything from Recreation.gov",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip facilities already completed by a recent run that crashed",
+    )
+    parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="Abort the whole run as soon as any facility fails",
+    )
+    parser.add_argument(
+        "--tier",
+        choices=["full", "rolling", "availability"],
+        default="full",
+        help=(
+            "Which data to refresh: everything (`full`); only availability, "
+            "for facilities in the previous output (`availability`); or "
+            "availability, plus everything for a rotating subset of "
+            "facilities (`rolling`)"
+        ),
+    )
+    parser.add_argument(
+        "--legacy-format",
+        action="store_true",
+        help=(
+            "Write availability as a mapping of every night to whether it's "
+            "available, and indent the output, instead of the compact encoding"
+        ),
+    )
+    parser.add_argument(
+        "--artifacts",
+        action="store_true",
+        help=(
+            "Also write gzip and Brotli copies of the output, a columnar "
+            "MessagePack copy of its availability, and a list of them for upload"
+        ),
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        help=(
+            "Only scrape the `i`th of `N` deterministic partitions of the "
+            "facilities, eg `2/4`, and write them to a shard file for "
+            "`merge_shards.py` to combine"
+        ),
+    )
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        help="Don't save changes in availability to the history database",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        help=(
+            "Finish within this many seconds, refreshing the availability "
+            "most likely to have changed first, then any stale static data, "
+            "and keeping previous records for whatever there isn't time for"
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the run with cProfile, and save the stats to the data directory",
+    )
+    args = parser.parse_args(argv)
+    started_at = time.monotonic()
 
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
 
-if __name__ == "__main__":
-    output_path = os.path.join(sys.path[0], "availability.json")
-    data = []
+    output_path = os.path.join(args.data_dir, "availability.json")
+    learned_rates_path = os.path.join(args.data_dir, config.LEARNED_RATES_FILE_NAME)
+    response_cache.directory = os.path.join(args.data_dir, config.CACHE_DIRECTORY)
 
-    facilities_on_stilts = get_facilities_on_stilts()
+    if args.no_cache:
+        response_cache.enabled = False
+
+    rate_limiter.load_rates(learned_rates_path)
+    campsite_map_path = os.path.join(args.data_dir, config.CAMPSITE_MAP_FILE_NAME)
+    campsite_map.load(campsite_map_path)
 
-    for facility_id in get_facility_ids():
-        metadata = get_facility_metadata(facility_id)
-        if metadata is None:
-            logger.info(
-                "Found no metadata for facility ID {}; skipping".format(facility_id)
+    # Every finished facility is logged to the journal, so that a
+    # crashed run can be picked up again with `--resume`
+    journal = RunJournal(os.path.join(args.data_dir, config.JOURNAL_FILE_NAME))
+    completed_facility_ids = journal.start(
+        args.resume, config.JOURNAL_RUN_WINDOW_SECONDS
+    )
+    if completed_facility_ids:
+        logger.info(
+            "Resuming run; skipping {} already-completed facilities".format(
+                len(completed_facility_ids)
             )
-            continue
+        )
+
+    facility_ids = get_facility_ids(args.facility_ids_file)
+    if args.shard is not None:
+        facility_ids = [i for i in facility_ids if is_in_shard(i, args.shard)]
         logger.info(
-            "Fetching information for {}".format(metadata["facility_name"].title())
+            "Scraping shard {}/{}, of {} facilities".format(
+                *args.shard, len(facility_ids)
+            )
         )
+    shard_facility_ids = facility_ids
+    facilities_on_stilts = get_facilities_on_stilts()
+    previous_records = get_previous_records(output_path)
+    if args.time_budget is None:
+        deadline = None
+    else:
+        # Leave enough time at the end to write the output
+        deadline = started_at + args.time_budget - config.TIME_BUDGET_RESERVE_SECONDS
+    if args.tier == "availability":
+        facility_ids = [i for i in facility_ids if i in previous_records]
+    else:
+        # Under a time budget, the harvest stops paging at its deadline,
+        # and is abandoned there if a request is still backing off
+        harvest_deadline = None
+        if deadline is not None:
+            harvest_deadline = min(
+                deadline,
+                started_at + args.time_budget * config.HARVEST_TIME_BUDGET_FRACTION,
+            )
+
+        harvests = []
+
+        def harvest():
+            harvests.append(
+                harvest_campsites(
+                    config.CAMPSITE_TYPES,
+                    revalidate=args.tier == "rolling",
+                    deadline=harvest_deadline,
+                )
+            )
+
+        try:
+            if harvest_deadline is None:
+                harvest()
+            else:
+                DeadlineScheduler(
+                    harvest_deadline, {"harvest": config.DEFAULT_HARVEST_SECONDS}
+                ).run([("harvest", harvest)], 1)
+            # A harvest that was skipped, or that was abandoned or cut
+            # short at its deadline, has nothing to show for it
+            if harvests and harvests[0] is not None:
+                harvested_campsites.update(harvests[0])
+            else:
+                logger.warning(
+                    "Ran out of time budget to harvest campsites in bulk; will "
+                    "query each facility instead"
+                )
+        except Exception as e:
+            if args.fail_fast:
+                raise
+            logger.warning(
+                "Failed to harvest campsites in bulk; will query each facility "
+                "instead: {}: {}".format(type(e).__name__, e)
+            )
 
-        campsite_id = get_campsite_id(facility_id)
-        if campsite_id is None:
-            logger.info(f'Found no campsites for {metadata["facility_name"]}; skipping')
-            continue
-
-        # Since they're not yet being used on the front-end, skip scraping
-        # images and rate. We're already being rate-limited by the
-        # Recreation.gov API, so decreasing the number of overall requests is
-        # a good idea.
-        record = {
-            "metadata": {**metadata, **get_campsite_metadata(campsite_id)},
-            "attributes": get_attributes(facility_id),
-            # 'images': get_images(facility_id),
-            "images": [],
-            "cell_coverage": get_cell_coverage(facility_id),
-            # 'rate': get_facility_rate(facility_id),
-            "rate": None,
-            "availability": get_campsite_availability(campsite_id),
-            "extras": {
-                "on_stilts": metadata["facility_id"] in facilities_on_stilts,
+    # Unexpected responses (eg, a failed `assert` on a field that
+    # Recreation.gov has changed) shouldn't abort the whole run. Record
+    # each failed facility, and retry it once everything else is done.
+    failures = {}
+    # Tasks abandoned at a deadline may still finish later, so their
+    # results are only recorded until the output starts being built
+    results_lock = threading.Lock()
+    results_closed = threading.Event()
+
+    def scrape_facility(facility_id, full_refresh=None):
+        if full_refresh is None:
+            full_refresh = is_due_for_full_refresh(
+                facility_id, args.tier, previous_records
+            )
+        try:
+            if full_refresh:
+                # The `rolling` tier's full refreshes come around about as
+                # often as cached responses go stale, so they'd often be
+                # served from the cache without this
+                record = get_record(
+                    facility_id,
+                    facilities_on_stilts,
+                    revalidate=args.tier == "rolling",
+                )
+            else:
+                record = get_refreshed_availability_record(
+                    previous_records[facility_id], facilities_on_stilts
+                )
+        except Exception as e:
+            if args.fail_fast:
+                raise
+            with results_lock:
+                if results_closed.is_set():
+                    return
+                logger.warning(
+                    "Failed to scrape facility {}, will retry later: {}: {}".format(
+                        facility_id, type(e).__name__, e
+                    )
+                )
+                failures[facility_id] = {
+                    "facility_id": facility_id,
+                    "error": type(e).__name__,
+                    "message": str(e),
+                }
+            return
+        with results_lock:
+            if results_closed.is_set():
+                return
+            journal.append(facility_id, record)
+            failures.pop(facility_id, None)
+
+    remaining_facility_ids = [
+        i for i in facility_ids if i not in completed_facility_ids
+    ]
+    if args.time_budget is None:
+        executor = ThreadPoolExecutor(max_workers=config.MAX_CONCURRENT_FACILITIES)
+        try:
+            # Consume the results, so that any exception is raised here
+            list(executor.map(scrape_facility, remaining_facility_ids))
+        finally:
+            # If one facility fails, don't keep scraping all of the others
+            # before the error is surfaced
+            executor.shutdown(cancel_futures=True)
+        skipped_count = 0
+    else:
+        scheduler = DeadlineScheduler(
+            deadline,
+            {
+                "availability": config.DEFAULT_AVAILABILITY_REFRESH_SECONDS,
+                "full": config.DEFAULT_FULL_REFRESH_SECONDS,
             },
+        )
+
+        # First, refresh the availability of facilities that already have
+        # a record, and aren't due to be scraped in full, starting with
+        # those likeliest to have changed. Then, scrape everything for the
+        # facilities that are due for it, starting with those that have no
+        # record at all. Each facility is only scraped once.
+        due_facility_ids = {
+            i
+            for i in remaining_facility_ids
+            if is_due_for_full_refresh(i, args.tier, previous_records)
         }
-        if (
-            record["availability"] is None
-            and record["cell_coverage"] is None
-            and record["rate"] is None
-        ):
-            logger.info(
-                "Skipping probably-closed campground {}".format(
-                    metadata["facility_name"]
+        tasks = [
+            (
+                "availability",
+                functools.partial(scrape_facility, facility_id, full_refresh=False),
+            )
+            for facility_id in sorted(
+                (
+                    i
+                    for i in remaining_facility_ids
+                    if i in previous_records and i not in due_facility_ids
+                ),
+                key=lambda i: get_change_likelihood(previous_records[i]),
+                reverse=True,
+            )
+        ] + [
+            ("full", functools.partial(scrape_facility, facility_id, full_refresh=True))
+            for facility_id in sorted(
+                (i for i in remaining_facility_ids if i in due_facility_ids),
+                key=lambda i: (
+                    i in previous_records,
+                    (
+                        -get_change_likelihood(previous_records[i])
+                        if i in previous_records
+                        else 0
+                    ),
+                ),
+            )
+        ]
+        scheduler.run(tasks, config.MAX_CONCURRENT_FACILITIES)
+        skipped_count = scheduler.skipped_count
+        if skipped_count:
+            logger.warning(
+                "Ran out of time budget; skipped {} of {} refreshes".format(
+                    skipped_count, len(tasks)
                 )
             )
-            continue
+
+    # Retry failures one at a time, within a smaller time budget than
+    # the main pass. A retry that isn't expected to finish in time isn't
+    # started, and one that's still running at the deadline (eg, while
+    # backing off) is abandoned, so that the output is still written on
+    # time.
+    retry_deadline = time.monotonic() + config.RETRY_TIME_BUDGET_SECONDS
+    if deadline is not None:
+        retry_deadline = min(retry_deadline, deadline)
+    retry_scheduler = DeadlineScheduler(
+        retry_deadline,
+        {
+            "availability": (
+                config.DEFAULT_AVAILABILITY_REFRESH_SECONDS
+                if deadline is None
+                else scheduler.estimate("availability")
+            ),
+            "full": (
+                config.DEFAULT_FULL_REFRESH_SECONDS
+                if deadline is None
+                else scheduler.estimate("full")
+            ),
+        },
+    )
+
+    with results_lock:
+        retry_facility_ids = sorted(failures)
+
+    def retry_facility(facility_id):
+        logger.info("Retrying failed facility {}".format(facility_id))
+        scrape_facility(facility_id)
+
+    retry_scheduler.run(
+        [
+            (
+                (
+                    "full"
+                    if is_due_for_full_refresh(i, args.tier, previous_records)
+                    else "availability"
+                ),
+                functools.partial(retry_facility, i),
+            )
+            for i in retry_facility_ids
+        ],
+        1,
+    )
+    if retry_scheduler.skipped_count:
+        logger.warning(
+            "Ran out of time to retry failed facilities; skipped {}".format(
+                retry_scheduler.skipped_count
+            )
+        )
+
+    rate_limiter.save_rates(learned_rates_path)
+    campsite_map.save(campsite_map_path)
+    logger.info(
+        "Learned request rates: {}".format(
+            ", ".join(
+                "{} {:.2f}/s".format(family, rate)
+                for family, rate in rate_limiter.get_rates().items()
+            )
+        )
+    )
+
+    with results_lock:
+        results_closed.set()
+
+    # Build the output from the journal, in the same order as the
+    # facility ID file. For facilities that still failed, or that there
+    # wasn't time for, fall back to their record from the previous run,
+    # if there is one.
+    records = journal.get_records()
+    if not args.no_history:
+        # Only freshly-scraped records are new observations; anything
+        # carried forward was already recorded by an earlier run
+        history = AvailabilityHistory(
+            os.path.join(args.data_dir, config.HISTORY_FILE_NAME)
+        )
+        change_count = history.record(records.values(), time.time())
+        history.close()
+        logger.info("Saved {} changed nights to the history".format(change_count))
+    data = []
+    for facility_id in facility_ids:
+        if facility_id in records:
+            record = records[facility_id]
         else:
+            record = previous_records.get(facility_id)
+        if facility_id in failures:
+            failures[facility_id]["carried_forward"] = record is not None
+        if record is not None:
             data.append(record)
 
-    with open(output_path, "w") as f:
-        json.dump(data, f, indent=4)
+    if args.shard is None:
+        write_output(output_path, data, args.legacy_format)
+        if args.artifacts:
+            write_artifacts(output_path, data)
+    else:
+        # Note which facilities the shard was responsible for, as well as
+        # the records it found, so that the merge can tell a facility
+        # that was skipped from one that was never scraped at all
+        shard_path = os.path.join(args.data_dir, get_shard_output_file_name(args.shard))
+        with open(shard_path, "w") as f:
+            json.dump(
+                {
+                    "shard": args.shard,
+                    "facility_ids": shard_facility_ids,
+                    "legacy_format": args.legacy_format,
+                    "records": (
+                        data
+                        if args.legacy_format
+                        else [encode_record(record) for record in data]
+                    ),
+                },
+                f,
+                separators=(",", ":"),
+            )
+        logger.info("Wrote shard output to {}".format(shard_path))
+
+    failures_path = os.path.join(args.data_dir, config.FAILURES_FILE_NAME)
+    with open(failures_path, "w") as f:
+        json.dump([failures[i] for i in sorted(failures)], f, indent=4)
+    if failures:
+        logger.warning(
+            "{} facilities failed; see {}".format(len(failures), failures_path)
+        )
+
+    metrics_path = os.path.join(args.data_dir, config.RUN_METRICS_FILE_NAME)
+    with open(metrics_path, "w") as f:
+        json.dump(
+            {
+                **run_metrics.to_dict(),
+                "facility_count": len(facility_ids),
+                "record_count": len(data),
+                "failure_count": len(failures),
+                "skipped_refresh_count": skipped_count,
+                "learned_rates": rate_limiter.get_rates(),
+                "http": http_client.get_stats(),
+                # Responses that didn't look as expected, by kind
+                "response_warnings": {
+                    name: dict(warnings.counts)
+                    for name, warnings in [
+                        ("campground", project_campground.warnings),
+                        ("image", project_image.warnings),
+                        ("campsite", project_campsite.warnings),
+                        ("attribute", attribute_warnings),
+                    ]
+                },
+            },
+            f,
+            indent=4,
+        )
+    logger.info("Wrote run metrics to {}".format(metrics_path))
+
+    # Only once the output is written, so that reading through the whole
+    # cache never holds it up
+    if not args.no_cache:
+        logger.info(
+            "Evicted {} stale cache entries".format(
+                response_cache.evict_stale_entries()
+            )
+        )
+
+    if args.profile:
+        profiler.disable()
+        profile_path = os.path.join(args.data_dir, config.PROFILE_FILE_NAME)
+        profiler.dump_stats(profile_path)
+        logger.info(
+            "Wrote profile to {}; view it with `python -m pstats`".format(profile_path)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import sqlite3
+
+
+# Each observation notes whether the night was available beforehand,
+# which is `NULL` for a night's first observation, so that transitions
+# can be queried without looking back through earlier observations
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    facility_id TEXT NOT NULL,
+    night TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    is_available INTEGER NOT NULL,
+    was_available INTEGER,
+    PRIMARY KEY (facility_id, night, observed_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS observations_by_time ON observations (observed_at);
+CREATE TABLE IF NOT EXISTS latest (
+    facility_id TEXT NOT NULL,
+    night TEXT NOT NULL,
+    is_available INTEGER NOT NULL,
+    PRIMARY KEY (facility_id, night)
+) WITHOUT ROWID;
+"""
+
+# Histories saved before `was_available` was stored are filled in from
+# each observation's predecessor, once
+ADD_WAS_AVAILABLE = """
+ALTER TABLE observations ADD COLUMN was_available INTEGER;
+UPDATE observations SET was_available = (
+    SELECT previous.is_available
+    FROM observations AS previous
+    WHERE previous.facility_id = observations.facility_id
+        AND previous.night = observations.night
+        AND previous.observed_at < observations.observed_at
+    ORDER BY previous.observed_at DESC
+    LIMIT 1
+);
+"""
+
+
+class AvailabilityHistory:
+    """
+    A SQLite store of how each facility's nights' availability has
+    changed over time. Only changes are stored: a night is recorded when
+    it's first seen, and again each time it flips between available and
+    booked. The latest status of every night is kept in a separate
+    table, so that finding what changed doesn't require scanning history.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        columns = [
+            column[1]
+            for column in self.connection.execute("PRAGMA table_info(observations)")
+        ]
+        if "was_available" not in columns:
+            self.connection.executescript("BEGIN;" + ADD_WAS_AVAILABLE + "COMMIT;")
+
+    def close(self):
+        self.connection.close()
+
+    def record(self, records, observed_at):
+        """
+        Save the nights in these output records whose availability differs
+        from what was last seen, and return how many were saved
+        """
+        changes = []
+        for record in records:
+            if record is None or record["availability"] is None:
+                continue
+            facility_id = record["metadata"]["facility_id"]
+            latest = dict(
+                self.connection.execute(
+                    "SELECT night, is_available FROM latest WHERE facility_id = ?",
+                    (facility_id,),
+                )
+            )
+            changes.extend(
+                (facility_id, night, int(is_available), latest.get(night))
+                for night, is_available in record["availability"].items()
+                if latest.get(night) != int(is_available)
+            )
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO observations VALUES (?, ?, ?, ?, ?)",
+                [(f, n, observed_at, a, w) for f, n, a, w in changes],
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO latest VALUES (?, ?, ?)",
+                [(f, n, a) for f, n, a, _ in changes],
+            )
+        return len(changes)
+
+    def get_night_history(self, facility_id, night):
+        """Return each `(observed_at, is_available)` change to a night"""
+        return [
+            (observed_at, bool(is_available))
+            for observed_at, is_available in self.connection.execute(
+                "SELECT observed_at, is_available FROM observations "
+                "WHERE facility_id = ? AND night = ? ORDER BY observed_at",
+                (facility_id, night),
+            )
+        ]
+
+    def _query_transitions(self, select, facility_id, since, until, suffix=""):
+        """
+        Run a query over every time a night was booked or became available
+        again. Only changes are stored, so that's every observation but a
+        night's first; the facility and the period are looked up by index.
+        """
+        # Nights stop being available once they've passed, which isn't a
+        # booking, so ignore changes seen after the night itself
+        query = (
+            "SELECT {} FROM observations WHERE was_available IS NOT NULL "
+            "AND date(observed_at, 'unixepoch') <= night"
+        ).format(select)
+        parameters = []
+        if facility_id is not None:
+            query += " AND facility_id = ?"
+            parameters.append(facility_id)
+        if since is not None:
+            query += " AND observed_at >= ?"
+            parameters.append(since)
+        if until is not None:
+            query += " AND observed_at < ?"
+            parameters.append(until)
+        return self.connection.execute(query + suffix, parameters)
+
+    def get_transitions(self, facility_id=None, since=None, until=None):
+        """
+        Return the `(facility_id, night, observed_at, is_available)` of
+        every time a night was booked (`is_available` is `False`) or
+        became available again, eg through a cancellation
+        """
+        return [
+            (facility_id, night, observed_at, bool(is_available))
+            for facility_id, night, observed_at, is_available in self._query_transitions(
+                "facility_id, night, observed_at, is_available",
+                facility_id,
+                since,
+                until,
+                " ORDER BY observed_at",
+            )
+        ]
+
+    def get_demand(self, since=None, until=None):
+        """
+        Summarize each facility's bookings and cancellations over a period,
+        busiest facilities first
+        """
+        return {
+            facility_id: {"bookings": bookings, "cancellations": cancellations}
+            for facility_id, bookings, cancellations in self._query_transitions(
+                "facility_id, SUM(is_available = 0), SUM(is_available = 1)",
+                None,
+                since,
+                until,
+                " GROUP BY facility_id ORDER BY 2 DESC, facility_id",
+            )
+        }
+
+    def get_booking_velocity(self, facility_id, since=None, until=None):
+        """
+        Return how many nights at a facility were booked per day, on each
+        day that any were, as a mapping of dates to counts
+        """
+        return dict(
+            self._query_transitions(
+                "date(observed_at, 'unixepoch') AS day, COUNT(*)",
+                facility_id,
+                since,
+                until,
+                " AND is_available = 0 GROUP BY day ORDER BY day",
+            )
+        )
+
+    def get_booking_lead_times(self, facility_id):
+        """
+        Return how many days ahead of each night it was booked, for every
+        night at a facility that's been seen getting booked
+        """
+        return dict(
+            self._query_transitions(
+                "night, julianday(night) - julianday(MIN(observed_at), 'unixepoch')",
+                facility_id,
+                None,
+                None,
+                " AND is_available = 0 GROUP BY night ORDER BY night",
+            )
+        )
@@ -0,0 +1,138 @@
+from collections import Counter
+from concurrent.futures import Future
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+
+
+class ConnectionCountingAdapter(HTTPAdapter):
+    """
+    An `HTTPAdapter` that counts every time one of its connections
+    connects, by URL scheme. urllib3 only counts the connection objects
+    it creates, but a connection that was dropped (eg, because a
+    response was closed before it was fully read) reconnects using the
+    same object, with a new TCP and TLS handshake all the same.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.connect_counts = Counter()
+        self._connect_counts_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: self._count_connects(pool_class)
+            for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+    def _record_connect(self, scheme):
+        with self._connect_counts_lock:
+            self.connect_counts[scheme] += 1
+
+    def get_connect_counts(self):
+        with self._connect_counts_lock:
+            return Counter(self.connect_counts)
+
+    def _count_connects(self, pool_class):
+        record_connect = self._record_connect
+
+        class ConnectionCls(pool_class.ConnectionCls):
+            def connect(self):
+                record_connect(pool_class.scheme)
+                super().connect()
+
+        return type(
+            pool_class.__name__, (pool_class,), {"ConnectionCls": ConnectionCls}
+        )
+
+
+class HttpClient:
+    """
+    A thread-safe HTTP client that every request from a script goes
+    through. Connections are pooled and kept alive between requests, so
+    that each host only pays for a TCP and TLS handshake once per
+    connection, instead of once per request. Responses are compressed
+    whenever the server supports it (Brotli too, if `brotli` is
+    installed), and every request gets a timeout unless it sets its own.
+    """
+
+    def __init__(self, timeout, pool_host_count, pool_size, headers=None):
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Connections beyond `pool_size` to a host are still made when
+        # needed, but aren't kept alive afterwards
+        adapter = ConnectionCountingAdapter(
+            pool_connections=pool_host_count, pool_maxsize=pool_size
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(make_headers(accept_encoding=True))
+        self.session.headers.update(headers or {})
+        self._adapter = adapter
+
+        self.request_count = 0
+        self.coalesced_count = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        with self._lock:
+            self.request_count += 1
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    def coalesce(self, key, function):
+        """
+        Return `function()`, unless another thread is already calling it
+        for the same key, in which case wait for that call to finish and
+        share its result (or its exception) instead of repeating it
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_first = future is None
+            if is_first:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced_count += 1
+        if not is_first:
+            return future.result()
+
+        try:
+            result = function()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def get_stats(self):
+        """
+        Count the requests sent, and the connections (and so TCP and TLS
+        handshakes) that were opened for them, including reconnections.
+        Every request that didn't need a new connection reused one.
+        """
+        with self._lock:
+            request_count = self.request_count
+        connect_counts = self._adapter.get_connect_counts()
+        connection_count = sum(connect_counts.values())
+        tls_connection_count = connect_counts["https"]
+        return {
+            "request_count": request_count,
+            "connection_count": connection_count,
+            "reused_connection_count": max(0, request_count - connection_count),
+            "tls_handshake_count": tls_connection_count,
+            "coalesced_request_count": self.coalesced_count,
+        }
@@ -0,0 +1,64 @@
+import json
+import os
+import threading
+import time
+
+
+class RunJournal:
+    """
+    A durable, append-only JSONL log of each facility's finished output
+    record. The first line is a header noting when the run started;
+    every following line holds one facility's ID and record (which is
+    `null` for a facility that was skipped). Each line is flushed to
+    disk as soon as it's written, so nothing is lost if the run crashes
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read_lines(self):
+        lines = []
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    lines.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A crash may have left a partially-written last line
+                    break
+        return lines
+
+    def _write_line(self, f, line):
+        f.write(json.dumps(line) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    def start(self, resume, run_window):
+        """
+        Begin a run, and return the IDs of facilities that are already
+        complete. If `resume` is set and the journal's run started within
+        `run_window` seconds, its entries are kept; otherwise the journal
+        is cleared and a new run is started
+        """
+        if resume and os.path.exists(self.path):
+            lines = self._read_lines()
+            if lines and time.time() - lines[0]["started_at"] < run_window:
+                # Rewrite the journal, in case it ends in a broken line
+                # that later entries would otherwise be appended after
+                with open(self.path, "w") as f:
+                    for line in lines:
+                        self._write_line(f, line)
+                return {line["facility_id"] for line in lines[1:]}
+
+        with open(self.path, "w") as f:
+            self._write_line(f, {"started_at": time.time()})
+        return set()
+
+    def append(self, facility_id, record):
+        with self._lock:
+            with open(self.path, "a") as f:
+                self._write_line(f, {"facility_id": facility_id, "record": record})
+
+    def get_records(self):
+        """Return a mapping of each completed facility ID to its record"""
+        return {line["facility_id"]: line["record"] for line in self._read_lines()[1:]}
@@ -0,0 +1,131 @@
+#! /usr/bin/env python3
+
+"""
+Combine the outputs of `get_availability.py --shard i/N` runs into a
+single `availability.json`, ordered like the facility ID file. The merge
+is refused if any shard is missing, or if any facility is missing from,
+or duplicated across, the shards.
+"""
+
+import argparse
+from collections import Counter
+import json
+import logging
+import os
+import sys
+
+from availability_encoding import decode_record
+from get_availability import get_facility_ids, write_output
+from output_formats import write_artifacts
+
+
+logger = logging.getLogger(__file__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.INFO)
+
+
+def get_problems(shards, facility_ids):
+    """List everything that would make the merged output incomplete or wrong"""
+    problems = []
+
+    shard_counts = {shard["shard"][1] for shard in shards}
+    if len(shard_counts) != 1:
+        return ["Shards disagree on the shard count: {}".format(sorted(shard_counts))]
+    (shard_count,) = shard_counts
+    index_counts = Counter(shard["shard"][0] for shard in shards)
+    for index in range(1, shard_count + 1):
+        if index_counts[index] == 0:
+            problems.append("Shard {}/{} is missing".format(index, shard_count))
+        elif index_counts[index] > 1:
+            problems.append(
+                "Shard {}/{} was given more than once".format(index, shard_count)
+            )
+
+    if len({shard["legacy_format"] for shard in shards}) != 1:
+        problems.append("Shards disagree on whether to use the legacy format")
+
+    assigned_counts = Counter(i for shard in shards for i in shard["facility_ids"])
+    record_counts = Counter(
+        record["metadata"]["facility_id"]
+        for shard in shards
+        for record in shard["records"]
+    )
+    for facility_id in facility_ids:
+        if assigned_counts[facility_id] == 0:
+            problems.append(
+                "Facility {} wasn't assigned to any shard".format(facility_id)
+            )
+    known_facility_ids = set(facility_ids)
+    for facility_id, count in sorted(assigned_counts.items()):
+        if facility_id not in known_facility_ids:
+            problems.append(
+                "Facility {} isn't in the facility ID file".format(facility_id)
+            )
+        if count > 1:
+            problems.append(
+                "Facility {} was assigned to {} shards".format(facility_id, count)
+            )
+    for facility_id, count in sorted(record_counts.items()):
+        if count > 1:
+            problems.append(
+                "Facility {} has {} records across the shards".format(
+                    facility_id, count
+                )
+            )
+
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("shard_paths", nargs="+", help="Each shard's output file")
+    parser.add_argument(
+        "--facility-ids-file",
+        default=os.path.join(sys.path[0], "compiled_facility_ids.txt"),
+        help="The facility ID file that the shards were scraped from",
+    )
+    parser.add_argument(
+        "--output",
+        default=os.path.join(sys.path[0], "availability.json"),
+        help="Where to write the merged output",
+    )
+    parser.add_argument(
+        "--artifacts",
+        action="store_true",
+        help=(
+            "Also write gzip and Brotli copies of the output, a columnar "
+            "MessagePack copy of its availability, and a list of them for upload"
+        ),
+    )
+    args = parser.parse_args(argv)
+
+    shards = []
+    for path in args.shard_paths:
+        with open(path, "r") as f:
+            shards.append(json.load(f))
+    facility_ids = get_facility_ids(args.facility_ids_file)
+
+    problems = get_problems(shards, facility_ids)
+    if problems:
+        for problem in problems:
+            logger.error(problem)
+        sys.exit("Refusing to merge {} shards".format(len(shards)))
+
+    records = {
+        record["metadata"]["facility_id"]: decode_record(record)
+        for shard in shards
+        for record in shard["records"]
+    }
+    merged_records = [records[i] for i in facility_ids if i in records]
+    write_output(args.output, merged_records, shards[0]["legacy_format"])
+    if args.artifacts:
+        write_artifacts(args.output, merged_records)
+    logger.info(
+        "Merged {} records from {} shards into {}".format(
+            len(records), len(shards), args.output
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
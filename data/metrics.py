@@ -0,0 +1,143 @@
+import bisect
+from collections import defaultdict
+import functools
+import threading
+import time
+
+
+# Upper bounds, in seconds, of the latency histograms' buckets
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10]
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total, 4),
+            "buckets": {
+                **{
+                    "<={}".format(bound): count
+                    for bound, count in zip(self.buckets, self.counts)
+                },
+                ">{}".format(self.buckets[-1]): self.counts[-1],
+            },
+        }
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.request_count = 0
+        self.cache_hit_count = 0
+        self.not_modified_count = 0
+        self.throttled_count = 0
+        self.bytes_downloaded = 0
+        self.decode_seconds = 0
+        self.rate_limit_wait_seconds = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+
+    def to_dict(self):
+        return {
+            "request_count": self.request_count,
+            "cache_hit_count": self.cache_hit_count,
+            "not_modified_count": self.not_modified_count,
+            "throttled_count": self.throttled_count,
+            "bytes_downloaded": self.bytes_downloaded,
+            "decode_seconds": round(self.decode_seconds, 4),
+            "rate_limit_wait_seconds": round(self.rate_limit_wait_seconds, 4),
+            "latency": self.latency.to_dict(),
+        }
+
+
+class RunMetrics:
+    """
+    Thread-safe counters and timings for a scraper run, broken down by
+    endpoint family, to show where the run's time went
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.endpoints = defaultdict(EndpointMetrics)
+        self.functions = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.backoff_count = 0
+        self.backoff_wait_seconds = 0
+        self._lock = threading.Lock()
+
+    def record_request(self, endpoint, latency, byte_count, decode_seconds):
+        with self._lock:
+            metrics = self.endpoints[endpoint]
+            metrics.request_count += 1
+            metrics.latency.observe(latency)
+            metrics.bytes_downloaded += byte_count
+            metrics.decode_seconds += decode_seconds
+
+    def record_rate_limit_wait(self, endpoint, seconds):
+        with self._lock:
+            self.endpoints[endpoint].rate_limit_wait_seconds += seconds
+
+    def record_cache_hit(self, endpoint):
+        with self._lock:
+            self.endpoints[endpoint].cache_hit_count += 1
+
+    def record_not_modified(self, endpoint):
+        with self._lock:
+            self.endpoints[endpoint].not_modified_count += 1
+
+    def record_throttled(self, endpoint):
+        with self._lock:
+            self.endpoints[endpoint].throttled_count += 1
+
+    def record_backoff(self, wait):
+        with self._lock:
+            self.backoff_count += 1
+            self.backoff_wait_seconds += wait
+
+    def timed(self, function):
+        """Decorate a function, to record how long each call to it takes"""
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started_at = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.functions[function.__name__].observe(
+                        time.perf_counter() - started_at
+                    )
+
+        return wrapper
+
+    def to_dict(self):
+        with self._lock:
+            endpoints = {
+                name: metrics.to_dict()
+                for name, metrics in sorted(self.endpoints.items())
+            }
+            return {
+                "elapsed_seconds": round(time.time() - self.started_at, 2),
+                "request_count": sum(e["request_count"] for e in endpoints.values()),
+                "bytes_downloaded": sum(
+                    e["bytes_downloaded"] for e in endpoints.values()
+                ),
+                "rate_limit_wait_seconds": round(
+                    sum(e["rate_limit_wait_seconds"] for e in endpoints.values()), 4
+                ),
+                "backoff_count": self.backoff_count,
+                "backoff_wait_seconds": round(self.backoff_wait_seconds, 4),
+                "endpoints": endpoints,
+                "functions": {
+                    name: histogram.to_dict()
+                    for name, histogram in sorted(self.functions.items())
+                },
+            }
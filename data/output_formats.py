@@ -0,0 +1,177 @@
+import datetime
+import gzip
+import json
+import logging
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from availability_encoding import get_available_runs
+
+
+logger = logging.getLogger(__file__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.INFO)
+
+# Bump this whenever the columnar format changes
+COLUMNAR_FORMAT_VERSION = 1
+
+# Metadata fields that are stored as columns alongside the matrix
+COLUMNAR_METADATA_FIELDS = [
+    "facility_id",
+    "facility_name",
+    "facility_latitude",
+    "facility_longitude",
+]
+
+
+def gzip_compress(body):
+    """
+    Compress with gzip, leaving out the timestamp and file name that
+    would otherwise make the output differ from run to run
+    """
+    return gzip.compress(body, compresslevel=9, mtime=0)
+
+
+def brotli_compress(body):
+    return brotli.compress(body, quality=11)
+
+
+def encode_columnar(records):
+    """
+    Encode decoded records' availability as a bit matrix, one row per
+    facility and one column per night, from the earliest night of any
+    facility to the latest. Each row is packed into bytes, with the first night in
+    the lowest bit of the first byte. A few metadata fields are stored
+    as columns too, in the same order as the rows. Serialized with
+    MessagePack, so that it can be loaded without parsing any JSON.
+    """
+    runs = [get_available_runs(record["availability"]) for record in records]
+    nights = [
+        night
+        for record in records
+        if record["availability"]
+        for night in (min(record["availability"]), max(record["availability"]))
+    ]
+    if nights:
+        first_night = datetime.date.fromisoformat(min(nights))
+        last_night = datetime.date.fromisoformat(max(nights))
+        night_count = (last_night - first_night).days + 1
+    else:
+        first_night = datetime.date.today()
+        night_count = 0
+
+    row_size = (night_count + 7) // 8
+    matrix = bytearray(row_size * len(records))
+    for row, facility_runs in enumerate(runs):
+        for run_first_night, run_last_night in facility_runs:
+            start = (run_first_night - first_night).days
+            end = (run_last_night - first_night).days
+            for night in range(start, end + 1):
+                matrix[row * row_size + night // 8] |= 1 << (night % 8)
+
+    return msgpack.packb(
+        {
+            "version": COLUMNAR_FORMAT_VERSION,
+            "first_night": first_night.isoformat(),
+            "night_count": night_count,
+            "columns": {
+                field: [record["metadata"].get(field) for record in records]
+                for field in COLUMNAR_METADATA_FIELDS
+            },
+            # Distinguishes facilities without availability data from
+            # those with no available nights
+            "has_availability": [
+                record["availability"] is not None for record in records
+            ],
+            "availability": bytes(matrix),
+        }
+    )
+
+
+def decode_columnar(body):
+    """
+    Load a columnar file, unpacking its matrix into one list of booleans
+    per facility
+    """
+    data = msgpack.unpackb(body)
+    night_count = data["night_count"]
+    row_size = (night_count + 7) // 8
+    matrix = data["availability"]
+    data["availability"] = [
+        (
+            [
+                bool(matrix[row * row_size + night // 8] >> (night % 8) & 1)
+                for night in range(night_count)
+            ]
+            if has_availability
+            else None
+        )
+        for row, has_availability in enumerate(data["has_availability"])
+    ]
+    return data
+
+
+def write_artifacts(output_path, records):
+    """
+    Write precompressed copies of the output next to it, and a columnar
+    copy of its availability, along with a list of the files and the
+    `Content-Type` and `Content-Encoding` each should be uploaded with.
+    Formats whose libraries aren't installed are skipped.
+    """
+    directory, file_name = os.path.split(output_path)
+    base_name = os.path.splitext(file_name)[0]
+    with open(output_path, "rb") as f:
+        body = f.read()
+
+    artifacts = [
+        (file_name, body, "application/json", None),
+        (file_name + ".gz", gzip_compress(body), "application/json", "gzip"),
+    ]
+    if brotli is None:
+        logger.warning("Skipping the Brotli artifact, since `brotli` isn't installed")
+    else:
+        artifacts.append(
+            (file_name + ".br", brotli_compress(body), "application/json", "br")
+        )
+    if msgpack is None:
+        logger.warning(
+            "Skipping the columnar artifacts, since `msgpack` isn't installed"
+        )
+    else:
+        columnar = encode_columnar(records)
+        artifacts += [
+            (base_name + ".msgpack", columnar, "application/msgpack", None),
+            (
+                base_name + ".msgpack.gz",
+                gzip_compress(columnar),
+                "application/msgpack",
+                "gzip",
+            ),
+        ]
+
+    for name, artifact_body, _, _ in artifacts[1:]:
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(artifact_body)
+    with open(os.path.join(directory, base_name + ".artifacts.json"), "w") as f:
+        json.dump(
+            [
+                {
+                    "path": name,
+                    "bytes": len(artifact_body),
+                    "content_type": content_type,
+                    "content_encoding": content_encoding,
+                }
+                for name, artifact_body, content_type, content_encoding in artifacts
+            ],
+            f,
+            indent=4,
+        )
+    return artifacts
@@ -0,0 +1,173 @@
+from collections import Counter
+import logging
+import threading
+
+
+logger = logging.getLogger(__file__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.INFO)
+
+# Stands in for fields that are missing from a response, since `None` is
+# a legitimate value
+MISSING = object()
+
+
+class ProjectionError(ValueError):
+    """Raised when a response is missing a field that a projection requires"""
+
+
+class WarningCounter:
+    """
+    Logs each kind of warning the first time it happens, and only counts
+    it after that, so that a change to a response shared by thousands of
+    facilities doesn't flood the log
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def warn(self, key, message):
+        with self._lock:
+            self.counts[key] += 1
+            is_first = self.counts[key] == 1
+        if is_first:
+            logger.warning("{} (further occurrences are only counted)".format(message))
+
+
+class Keep:
+    """
+    Copy a field into the output, optionally under a new name or after
+    transforming its value. `expect` checks the raw value, and is either
+    a function returning whether the value is as expected, or a value it
+    should equal.
+    """
+
+    def __init__(self, name, rename=None, transform=None, expect=None, required=True):
+        self.name = name
+        self.rename = rename or name
+        self.transform = transform
+        self.expect = expect
+        self.required = required
+
+
+class Drop:
+    """Leave a field out of the output, after checking its value if `expect` is set"""
+
+    def __init__(self, name, expect=None):
+        self.name = name
+        self.expect = expect
+
+
+class Derive:
+    """
+    Compute an output field from the whole response, which reads the
+    `sources` fields
+    """
+
+    def __init__(self, name, function, sources):
+        self.name = name
+        self.function = function
+        self.sources = sources
+
+
+class Projection:
+    """
+    Turns one endpoint's responses into output records, as declared by a
+    list of `Keep`, `Drop`, and `Derive` fields. Each declaration is
+    turned into a step once, and each response is then run through the
+    steps in order.
+
+    Responses that don't match the declarations are reported, rather than
+    raising errors: with `keep_unexpected`, fields that aren't declared
+    are passed through to the output (otherwise they're ignored), and a
+    field whose value fails its expectation is still kept or dropped as
+    declared. Each is counted in `warnings`. Only a missing required
+    field raises an error.
+    """
+
+    def __init__(self, name, fields, keep_unexpected=False):
+        self.name = name
+        self.fields = fields
+        self.keep_unexpected = keep_unexpected
+        self.known_fields = frozenset(
+            [f.name for f in fields if not isinstance(f, Derive)]
+            + [source for f in fields if isinstance(f, Derive) for source in f.sources]
+        )
+        self.warnings = WarningCounter()
+        # Fields that are dropped without being checked need no step
+        self.steps = [
+            self.get_step(field)
+            for field in fields
+            if not (isinstance(field, Drop) and field.expect is None)
+        ]
+
+    def __call__(self, data):
+        output = {}
+        for step in self.steps:
+            step(data, output)
+        if self.keep_unexpected and not self.known_fields.issuperset(data):
+            for name in data:
+                if name not in self.known_fields:
+                    self.on_unexpected_field(name)
+                    output[name] = data[name]
+        return output
+
+    def on_missing_field(self, name):
+        raise ProjectionError(
+            "Found no `{}` field in {} response".format(name, self.name)
+        )
+
+    def on_unexpected_value(self, name, value):
+        self.warnings.warn(
+            "unexpected value: " + name,
+            "Found unexpected value for `{}` in {} response: {!r}".format(
+                name, self.name, value
+            ),
+        )
+
+    def on_unexpected_field(self, name):
+        self.warnings.warn(
+            "unexpected field: " + name,
+            "Found unexpected field `{}` in {} response; keeping it".format(
+                name, self.name
+            ),
+        )
+
+    def get_step(self, field):
+        """
+        Return a function that applies a field's declaration to a
+        response, adding to the output record as it goes
+        """
+        if isinstance(field, Derive):
+
+            def derive(data, output):
+                output[field.name] = field.function(data)
+
+            return derive
+
+        name = field.name
+        if field.expect is None or callable(field.expect):
+            is_expected = field.expect
+        else:
+
+            def is_expected(value):
+                return value == field.expect
+
+        is_kept = isinstance(field, Keep)
+        is_required = is_kept and field.required
+        rename = field.rename if is_kept else None
+        transform = field.transform if is_kept else None
+
+        def step(data, output):
+            value = data.get(name, MISSING)
+            if value is MISSING:
+                if is_required:
+                    self.on_missing_field(name)
+                return
+            if is_expected is not None and not is_expected(value):
+                self.on_unexpected_value(name, value)
+            if is_kept:
+                output[rename] = value if transform is None else transform(value)
+
+        return step
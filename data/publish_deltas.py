@@ -0,0 +1,184 @@
+#! /usr/bin/env python3
+
+"""
+Publish a new version of `availability.json` as a small patch against
+the previously-published version, so that clients which already have
+that version don't need to download everything again.
+
+The publish directory holds what was last published: `manifest.json`
+and `availability.json`. Each new version adds a patch file to it, and
+every `PUBLISH_SNAPSHOT_INTERVAL` versions (or whenever the previous
+version can't be trusted as a base), a full snapshot too. The manifest
+lists the latest snapshot and the recent patches, with their content
+hashes, so a client at version `k` applies patches `k + 1` onwards, and
+any client too far behind starts from the snapshot.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+
+import config
+
+
+logger = logging.getLogger(__file__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.INFO)
+
+
+def get_sha256(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+def get_patch(previous_records, current_records):
+    """
+    Describe how to turn one version's records into the next. Records
+    that are new, or whose fields have changed shape, are included in
+    full; otherwise, only their changed fields are
+    """
+    previous = {r["metadata"]["facility_id"]: r for r in previous_records}
+    current = {r["metadata"]["facility_id"]: r for r in current_records}
+
+    upserted = {}
+    updated = {}
+    for facility_id, record in current.items():
+        previous_record = previous.get(facility_id)
+        if previous_record is None or previous_record.keys() != record.keys():
+            upserted[facility_id] = record
+        else:
+            fields = {k: v for k, v in record.items() if previous_record[k] != v}
+            if fields:
+                updated[facility_id] = fields
+
+    return {
+        "upserted": upserted,
+        "updated": updated,
+        "removed": sorted(set(previous) - set(current)),
+        "order": list(current),
+    }
+
+
+def apply_patch(records, patch):
+    """Apply a patch from `get_patch` to a version's records"""
+    by_facility_id = {r["metadata"]["facility_id"]: r for r in records}
+    for facility_id in patch["removed"]:
+        del by_facility_id[facility_id]
+    for facility_id, fields in patch["updated"].items():
+        by_facility_id[facility_id] = {**by_facility_id[facility_id], **fields}
+    by_facility_id.update(patch["upserted"])
+    return [by_facility_id[facility_id] for facility_id in patch["order"]]
+
+
+def write_file(publish_dir, path, body):
+    full_path = os.path.join(publish_dir, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "wb") as f:
+        f.write(body)
+    return {"path": path, "sha256": get_sha256(body), "bytes": len(body)}
+
+
+def load_manifest(publish_dir):
+    try:
+        with open(os.path.join(publish_dir, config.MANIFEST_FILE_NAME), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def load_previous_body(publish_dir, manifest):
+    """
+    Return the previously-published `availability.json`, if it's exactly
+    the version the manifest describes; otherwise a patch against it
+    would be wrong
+    """
+    try:
+        with open(os.path.join(publish_dir, "availability.json"), "rb") as f:
+            body = f.read()
+    except FileNotFoundError:
+        return None
+    if manifest is None or get_sha256(body) != manifest["sha256"]:
+        return None
+    return body
+
+
+def publish(current_body, publish_dir, snapshot_interval):
+    """Publish a new version, and return the updated manifest"""
+    manifest = load_manifest(publish_dir)
+    previous_body = load_previous_body(publish_dir, manifest)
+    if previous_body == current_body:
+        logger.info("Nothing has changed since version {}".format(manifest["version"]))
+        return manifest
+
+    version = manifest["version"] + 1 if manifest else 1
+    snapshot = manifest["snapshot"] if manifest else None
+    patches = manifest["patches"] if manifest else []
+
+    if previous_body is None:
+        # Clients can't trust any earlier patches without a valid base
+        patches = []
+    else:
+        patch = {
+            "version": version,
+            "base_version": version - 1,
+            **get_patch(json.loads(previous_body), json.loads(current_body)),
+        }
+        patch_file = write_file(
+            publish_dir,
+            "patches/availability.v{}.patch.json".format(version),
+            json.dumps(patch, separators=(",", ":")).encode("utf-8"),
+        )
+        patches.append({"version": version, "base_version": version - 1, **patch_file})
+        logger.info(
+            "Published version {} as a {}-byte patch, against a {}-byte file".format(
+                version, patch_file["bytes"], len(current_body)
+            )
+        )
+
+    if (
+        snapshot is None
+        or previous_body is None
+        or version - snapshot["version"] >= snapshot_interval
+    ):
+        snapshot = {
+            "version": version,
+            **write_file(
+                publish_dir,
+                "snapshots/availability.v{}.json".format(version),
+                current_body,
+            ),
+        }
+        logger.info("Published version {} as a full snapshot".format(version))
+
+    write_file(publish_dir, "availability.json", current_body)
+    manifest = {
+        "version": version,
+        "sha256": get_sha256(current_body),
+        "snapshot": snapshot,
+        # Keep enough patches to bring a client up to date from the
+        # snapshot, or from any version newer than it
+        "patches": [p for p in patches if p["version"] > version - snapshot_interval],
+    }
+    with open(os.path.join(publish_dir, config.MANIFEST_FILE_NAME), "w") as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output_path", help="The newly-scraped `availability.json`")
+    parser.add_argument(
+        "publish_dir",
+        help="Where the previously-published manifest and output are, if any",
+    )
+    parser.add_argument(
+        "--snapshot-interval",
+        type=int,
+        default=config.PUBLISH_SNAPSHOT_INTERVAL,
+        help="Publish a full snapshot, rather than a patch, this often",
+    )
+    args = parser.parse_args()
+
+    with open(args.output_path, "rb") as f:
+        publish(f.read(), args.publish_dir, args.snapshot_interval)
@@ -0,0 +1,76 @@
+import threading
+import time
+
+
+class DeadlineScheduler:
+    """
+    Run prioritized tasks on several worker threads, without starting
+    any task that isn't expected to finish by the deadline. How long a
+    task takes is estimated from the tasks of the same kind that have
+    already run, falling back to `default_durations` until there are any.
+    """
+
+    def __init__(self, deadline, default_durations):
+        self.deadline = deadline
+        self.default_durations = default_durations
+        self.durations = {kind: [] for kind in default_durations}
+        self.skipped_count = 0
+        self._lock = threading.Lock()
+
+    def estimate(self, kind):
+        with self._lock:
+            durations = self.durations[kind]
+            if not durations:
+                return self.default_durations[kind]
+            return sum(durations) / len(durations)
+
+    def _record(self, kind, seconds):
+        with self._lock:
+            self.durations[kind].append(seconds)
+
+    def run(self, tasks, worker_count):
+        """
+        Run `(kind, function)` tasks, highest-priority first. Returns once
+        every task has run or been skipped, or at the deadline, whichever
+        comes first; tasks still running then are abandoned. Workers are
+        daemon threads, so abandoned tasks won't keep the process alive.
+        """
+        tasks = iter(tasks)
+        errors = []
+        is_stopped = threading.Event()
+
+        def work():
+            while not is_stopped.is_set():
+                with self._lock:
+                    task = next(tasks, None)
+                if task is None:
+                    return
+                kind, function = task
+                if time.monotonic() + self.estimate(kind) > self.deadline:
+                    with self._lock:
+                        self.skipped_count += 1
+                    continue
+
+                started_at = time.monotonic()
+                try:
+                    function()
+                except Exception as e:
+                    errors.append(e)
+                    is_stopped.set()
+                    return
+                self._record(kind, time.monotonic() - started_at)
+
+        workers = [
+            threading.Thread(target=work, daemon=True) for _ in range(worker_count)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(max(0, self.deadline - time.monotonic()))
+
+        is_stopped.set()
+        if errors:
+            raise errors[0]
+        # Anything that wasn't reached is skipped, too
+        with self._lock:
+            self.skipped_count += sum(1 for _ in tasks)
@@ -0,0 +1,433 @@
+#! /usr/bin/env python3
+
+"""
+A local stand-in for the parts of Recreation.gov's API that the scrapers
+use, so that they can be run and benchmarked without a network
+connection, and without being throttled.
+
+Responses are replayed from recorded fixture files. With `--record`, any
+fixture that's missing is fetched from the real API and saved; otherwise,
+with `--synthesize`, a plausible response is generated instead. Latency
+and `403` throttling can be injected, to mimic the real API.
+
+Point the scrapers at it with the `RECREATION_GOV_BASE_URL` environment
+variable, eg:
+
+    poetry run data/stand_in_server.py --synthesize --latency 0.1 &
+    RECREATION_GOV_BASE_URL=http://localhost:8000 poetry run data/get_availability.py
+"""
+
+import argparse
+from collections import deque
+import datetime
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+import zlib
+
+import requests
+
+import config
+
+
+logger = logging.getLogger(__file__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.INFO)
+
+LIVE_BASE_URL = "https://www.recreation.gov"
+
+# This is roughly what Recreation.gov sends when it's throttling requests
+FORBIDDEN_BODY = b"<html><head><title>403 Forbidden</title></head></html>"
+
+
+def get_fixture_file_name(path):
+    """Turn a request's path and query string into a file name"""
+    return re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") + ".json"
+
+
+def synthesize_campground(facility_id):
+    # Seed with the facility ID, so the same facility always looks the same
+    rng = random.Random(facility_id)
+    return {
+        "campground": {
+            "facility_id": facility_id,
+            "facility_name": "STAND-IN LOOKOUT {}".format(facility_id),
+            "is_deactivated": False,
+            "activated_date": "",
+            "attributes": None,
+            "certification_log": None,
+            "city": "",
+            "created_by": "",
+            "created_date": "",
+            "facility_time_zone": "America/Los_Angeles",
+            "is_commercially_managed": False,
+            "facility_lookups": None,
+            "inventory_type_id": "3",
+            "order_components": {
+                "camping_equipment": True,
+                "group_leader_details": True,
+                "group_size": True,
+                "num_vehicles": True,
+                "pass": True,
+            },
+            "org_id": "",
+            "receipt_autoprint": False,
+            "receipt_custom_text": "",
+            "state": "",
+            "updated_by": "",
+            "updated_date": "",
+            "addresses": [],
+            "facility_adaaccess": "N",
+            "facility_map_url": "",
+            "facility_reservation_url": "",
+            "facility_type": "STANDARD",
+            "facility_use_fee_description": "",
+            "fee_model": 1,
+            "stay_limit": "",
+            "activities": [{"activity_description": "Hiking"}],
+            "links": [],
+            "notices": [],
+            "facility_description_map": {"Overview": "A stand-in lookout."},
+            "facility_latitude": round(rng.uniform(42, 49), 4),
+            "facility_longitude": round(rng.uniform(-124, -110), 4),
+        }
+    }
+
+
+def synthesize_availability(campsite_id):
+    rng = random.Random(campsite_id)
+    start = datetime.date.today().replace(day=1)
+    booking_window_end = start + datetime.timedelta(days=180)
+
+    # The real endpoint responds with years' worth of nights, most of
+    # which aren't yet reservable
+    availabilities = {}
+    quantities = {}
+    for i in range(365 * 2):
+        night = start + datetime.timedelta(days=i)
+        key = night.isoformat() + "T00:00:00Z"
+        if night < booking_window_end:
+            availabilities[key] = rng.choice(["Available", "Reserved", "Reserved"])
+        else:
+            availabilities[key] = "NYR"
+        quantities[key] = 1
+
+    return {
+        "availability": {
+            "campsite_id": campsite_id,
+            "availabilities": availabilities,
+            "quantities": quantities,
+        }
+    }
+
+
+def get_facility_ids(catalog_size=None):
+    """
+    Search results list the facilities that the scrapers already know of,
+    or, given a catalog size, that many made-up facilities
+    """
+    if catalog_size is not None:
+        return [str(90000000 + i) for i in range(catalog_size)]
+    with open(os.path.join(sys.path[0], "compiled_facility_ids.txt"), "r") as f:
+        return [i for i in f.read().split("\n") if i]
+
+
+def synthesize_campsite_ids(facility_id):
+    # Most facilities have a single campsite, but some cabins and yurts
+    # share a facility with several others
+    rng = random.Random(facility_id)
+    campsite_count = 1 if rng.random() < 0.8 else rng.randint(2, 4)
+    return ["9" + facility_id] + [
+        "9{}{}".format(facility_id, i) for i in range(1, campsite_count)
+    ]
+
+
+def synthesize_campsite_search_result(facility_id, campsite_id):
+    return {
+        "asset_id": facility_id,
+        "campsite_id": campsite_id,
+        "attributes": [
+            {
+                "attribute_category": "site_details",
+                "attribute_name": "Max Num of People",
+                "attribute_value": "4",
+            },
+            {
+                "attribute_category": "amenities",
+                "attribute_name": "Fire Pit",
+                "attribute_value": "Y",
+            },
+        ],
+    }
+
+
+def synthesize_response(path, facility_ids):
+    """
+    Generate a plausible response for any of the endpoints the scrapers
+    use, with search results listing these facility IDs
+    """
+    if match := re.match(r"/api/camps/campgrounds/(\d+)$", path):
+        return synthesize_campground(match.group(1))
+    elif match := re.match(r"/api/camps/campgrounds/(\d+)/campsites$", path):
+        return {
+            "campsites": [
+                {"campsite_id": campsite_id}
+                for campsite_id in synthesize_campsite_ids(match.group(1))
+            ]
+        }
+    elif match := re.match(r"/api/camps/campgrounds/(\d+)/rates$", path):
+        return {"rates_list": [{"price_map": {"Overnight": 50}}]}
+    elif match := re.match(r"/api/camps/campsites/(\d+)$", path):
+        return {
+            "campsite": {
+                "campsite_id": match.group(1),
+                "is_accessible": False,
+                "campsite_type": "LOOKOUT",
+                "campsite_latitude": 0,
+                "campsite_longitude": 0,
+            }
+        }
+    elif match := re.match(r"/api/camps/availability/campsite/(\d+)/all$", path):
+        return synthesize_availability(match.group(1))
+    elif path.startswith("/api/search/campsites"):
+        query = parse_qs(urlparse(path).query)
+        filters = dict(f.split(":", 1) for f in query.get("fq", []))
+        if "asset_id" in filters:
+            facility_ids = [filters["asset_id"]]
+        campsites = [
+            synthesize_campsite_search_result(facility_id, campsite_id)
+            for facility_id in facility_ids
+            for campsite_id in synthesize_campsite_ids(facility_id)
+        ]
+        start = int(query.get("start", [0])[0])
+        size = int(query.get("size", [len(campsites)])[0])
+        return {"total": len(campsites), "campsites": campsites[start : start + size]}
+    elif path.startswith("/api/search"):
+        query = parse_qs(urlparse(path).query)
+        start = int(query.get("start", [0])[0])
+        size = int(query.get("size", [len(facility_ids)])[0])
+        return {
+            "results": [
+                {"entity_id": facility_id}
+                for facility_id in facility_ids[start : start + size]
+            ],
+            "total": len(facility_ids),
+        }
+    elif path.startswith("/api/ratingreview/aggregate"):
+        return {
+            "number_of_ratings": 1,
+            "aggregate_cell_coverage_ratings": [
+                {"carrier": "Verizon", "average_rating": 3, "number_of_ratings": 1}
+            ],
+        }
+    elif path.startswith("/api/media/public/asset/"):
+        return {"result": []}
+    else:
+        return None
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        fixtures_directory,
+        latency=0,
+        forbidden_probability=0,
+        max_requests_per_second=None,
+        record=False,
+        synthesize=False,
+        catalog_size=None,
+    ):
+        super().__init__(address, StandInRequestHandler)
+        self.fixtures_directory = fixtures_directory
+        self.latency = latency
+        self.forbidden_probability = forbidden_probability
+        self.max_requests_per_second = max_requests_per_second
+        self.record = record
+        self.synthesize = synthesize
+        self.catalog_size = catalog_size
+        self._facility_ids = None
+
+        self.request_count = 0
+        self.forbidden_count = 0
+        self.bytes_sent = 0
+        self._recent_request_times = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return "http://{}:{}".format(*self.server_address)
+
+    def is_throttled(self):
+        """Decide whether to respond to a request with a `403` error"""
+        with self._lock:
+            self.request_count += 1
+            now = time.monotonic()
+            self._recent_request_times.append(now)
+            while self._recent_request_times[0] < now - 1:
+                self._recent_request_times.popleft()
+
+            is_throttled = random.random() < self.forbidden_probability or (
+                self.max_requests_per_second is not None
+                and len(self._recent_request_times) > self.max_requests_per_second
+            )
+            if is_throttled:
+                self.forbidden_count += 1
+            return is_throttled
+
+    @property
+    def facility_ids(self):
+        if self._facility_ids is None:
+            self._facility_ids = get_facility_ids(self.catalog_size)
+        return self._facility_ids
+
+    def count_bytes_sent(self, byte_count):
+        with self._lock:
+            self.bytes_sent += byte_count
+
+    def get_response_body(self, path):
+        fixture_path = os.path.join(
+            self.fixtures_directory, get_fixture_file_name(path)
+        )
+        if os.path.exists(fixture_path):
+            with open(fixture_path, "rb") as f:
+                return f.read()
+
+        if self.record:
+            response = requests.get(
+                LIVE_BASE_URL + path, headers=config.FAKE_USER_AGENT_HEADER
+            )
+            if response.ok:
+                os.makedirs(self.fixtures_directory, exist_ok=True)
+                with open(fixture_path, "wb") as f:
+                    f.write(response.content)
+                logger.info("Recorded {}".format(path))
+                return response.content
+            logger.warning(
+                "Couldn't record {}: got status {}".format(path, response.status_code)
+            )
+
+        if self.synthesize:
+            body = synthesize_response(path, self.facility_ids)
+            if body is not None:
+                return json.dumps(body).encode("utf-8")
+
+        return None
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+    # Keep connections alive between requests, like the real API. Headers
+    # and body are written separately, so Nagle's algorithm would
+    # otherwise delay each response on a kept-alive connection.
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.server.is_throttled():
+            self.send_body(403, FORBIDDEN_BODY, "text/html")
+            return
+
+        body = self.server.get_response_body(self.path)
+        if body is None:
+            self.send_body(404, b'{"error": "Not found"}', "application/json")
+        else:
+            self.send_body(200, body, "application/json")
+
+    def send_body(self, status, body, content_type):
+        # Let clients revalidate their cached copies, like the real API
+        etag = '"{:x}"'.format(zlib.crc32(body))
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=6, mtime=0)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count_bytes_sent(len(body))
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def start_in_background(**kwargs):
+    """Start a stand-in server on a free local port, in a background thread"""
+    server = StandInServer(("127.0.0.1", 0), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--fixtures-directory",
+        default=os.path.join(sys.path[0], "fixtures"),
+        help="Where recorded responses are kept",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0,
+        help="Seconds to wait before responding to each request",
+    )
+    parser.add_argument(
+        "--forbidden-probability",
+        type=float,
+        default=0,
+        help="Fraction of requests to randomly respond to with a `403` error",
+    )
+    parser.add_argument(
+        "--max-requests-per-second",
+        type=float,
+        help="Respond with a `403` error to any requests beyond this rate",
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="Fetch and save missing fixtures from the real Recreation.gov API",
+    )
+    parser.add_argument(
+        "--synthesize",
+        action="store_true",
+        help="Generate a response for any missing fixtures",
+    )
+    parser.add_argument(
+        "--catalog-size",
+        type=int,
+        help="Synthesize search results listing this many made-up facilities",
+    )
+    args = parser.parse_args()
+
+    server = StandInServer(
+        ("127.0.0.1", args.port),
+        args.fixtures_directory,
+        latency=args.latency,
+        forbidden_probability=args.forbidden_probability,
+        max_requests_per_second=args.max_requests_per_second,
+        record=args.record,
+        synthesize=args.synthesize,
+        catalog_size=args.catalog_size,
+    )
+    logger.info("Serving a stand-in Recreation.gov at {}".format(server.base_url))
+    server.serve_forever()
@@ -0,0 +1,83 @@
+import codecs
+import re
+
+import requests
+
+
+# Only flat objects of string values are supported, which is all that's
+# needed for Recreation.gov's availability maps, eg:
+# `"availabilities": {"2022-06-15T00:00:00Z": "Reserved", ...}`
+OBJECT_START_PATTERN = r'"{key}"\s*:\s*(\{{|null)'
+OBJECT_ENTRY_PATTERN = re.compile(r'\s*(?:"([^"\\]*)"\s*:\s*"([^"\\]*)"\s*)?([,}])')
+# Whatever's left of the buffer after its last whole entry must be the
+# start of another one, which the next chunk will complete
+OBJECT_ENTRY_PREFIX_PATTERN = re.compile(
+    r'\s*(?:"[^"\\]*(?:"\s*(?::\s*(?:"[^"\\]*(?:"\s*)?)?)?)?)?'
+)
+
+
+class StreamParseError(ValueError):
+    """Raised when a streamed document doesn't hold the expected object"""
+
+
+def iter_object_items(chunks, key):
+    """
+    Yield each key-value pair of the JSON object found under `key` in a
+    JSON document, as the document is streamed in as chunks of bytes.
+    Only a small buffer is held in memory at any time, and no more of
+    the document is read than it takes to consume the object
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    start_pattern = re.compile(OBJECT_START_PATTERN.format(key=re.escape(key)))
+    buffer = ""
+    is_inside_object = False
+    has_checked_document_start = False
+
+    for chunk in chunks:
+        buffer += decoder.decode(chunk)
+
+        if not has_checked_document_start and buffer.strip():
+            # Throttled requests receive an HTML error page instead of JSON
+            if not buffer.lstrip().startswith("{"):
+                raise requests.exceptions.JSONDecodeError(
+                    "Expecting a JSON object", buffer, 0
+                )
+            has_checked_document_start = True
+
+        if not is_inside_object:
+            match = start_pattern.search(buffer)
+            if match is None:
+                # Hold on to enough of the buffer that a key split
+                # across two chunks will still be found
+                buffer = buffer[-(len(key) + 16) :]
+                continue
+            if match.group(1) == "null":
+                return
+            buffer = buffer[match.end() :]
+            is_inside_object = True
+
+        position = 0
+        while True:
+            match = OBJECT_ENTRY_PATTERN.match(buffer, position)
+            if match is None:
+                break
+            position = match.end()
+            if match.group(1) is not None:
+                yield match.group(1), match.group(2)
+            if match.group(3) == "}":
+                return
+        if not OBJECT_ENTRY_PREFIX_PATTERN.fullmatch(buffer, position):
+            raise StreamParseError(
+                "Found something other than a string value in `{}`: {!r}".format(
+                    key, buffer[position : position + 64]
+                )
+            )
+        buffer = buffer[position:]
+
+    # Like an empty response that isn't streamed, an empty document
+    # isn't JSON at all
+    if not has_checked_document_start:
+        raise requests.exceptions.JSONDecodeError("Expecting value", buffer, 0)
+    if is_inside_object:
+        raise StreamParseError("Document ended inside of `{}`".format(key))
+    raise StreamParseError("Found no `{}` object in document".format(key))
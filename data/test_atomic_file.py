@@ -0,0 +1,23 @@
+import json
+
+import pytest
+
+import atomic_file
+
+
+def test_write_json(tmp_path):
+    path = tmp_path / "data.json"
+    atomic_file.write_json(str(path), {"b": 1, "a": 2}, sort_keys=True)
+    assert path.read_text() == '{"a": 2, "b": 1}'
+    atomic_file.write_json(str(path), [1])
+    assert json.loads(path.read_text()) == [1]
+    assert [p.name for p in tmp_path.iterdir()] == ["data.json"]
+
+
+def test_failed_write_keeps_original(tmp_path):
+    path = tmp_path / "data.json"
+    atomic_file.write_json(str(path), {"a": 1})
+    with pytest.raises(TypeError):
+        atomic_file.write_json(str(path), {"a": object()})
+    assert json.loads(path.read_text()) == {"a": 1}
+    assert [p.name for p in tmp_path.iterdir()] == ["data.json"]
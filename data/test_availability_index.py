@@ -0,0 +1,107 @@
+import datetime
+
+from availability_encoding import decode_availability, encode_availability
+from availability_index import AvailabilityIndex
+
+
+def night(day):
+    return datetime.date(2022, 6, day)
+
+
+def build_availability(available_days, first_day=1, last_day=30):
+    return {
+        night(day).isoformat(): day in available_days
+        for day in range(first_day, last_day + 1)
+    }
+
+
+def build_index(available_days):
+    encoded = encode_availability(build_availability(available_days))
+    return AvailabilityIndex(
+        [{"metadata": {"facility_id": "1"}, "availability": encoded}]
+    )
+
+
+def test_encoding_round_trip():
+    availability = build_availability({1, 2, 3, 10, 28, 29, 30})
+    encoded = encode_availability(availability)
+    assert encoded["first_night"] == "2022-06-01"
+    assert encoded["last_night"] == "2022-06-30"
+    assert encoded["available"] == [[0, 3], [9, 1], [27, 3]]
+    assert decode_availability(encoded) == availability
+
+
+def test_encoding_round_trip_with_gaps():
+    # Nights missing from the mapping don't join the runs on either side
+    # of them, and are decoded as unavailable
+    availability = build_availability({5, 6, 8, 9})
+    del availability[night(7).isoformat()]
+    encoded = encode_availability(availability)
+    assert encoded["available"] == [[4, 2], [7, 2]]
+    assert decode_availability(encoded) == {
+        **availability,
+        night(7).isoformat(): False,
+    }
+
+
+def test_encoding_unavailable_and_missing():
+    availability = build_availability(set(), first_day=3, last_day=4)
+    encoded = encode_availability(availability)
+    assert encoded["available"] == []
+    assert decode_availability(encoded) == availability
+    assert encode_availability(None) is None
+    assert decode_availability(None) is None
+
+
+def test_legacy_encoding_is_decoded_as_is():
+    availability = build_availability({1})
+    assert decode_availability(availability) is availability
+
+
+def test_get_windows_without_bounds():
+    index = build_index({1, 2, 3, 10, 20, 21})
+    assert index.get_windows("1", 1) == [
+        (night(1), night(3)),
+        (night(10), night(10)),
+        (night(20), night(21)),
+    ]
+    assert index.get_windows("1", 2) == [
+        (night(1), night(3)),
+        (night(20), night(21)),
+    ]
+    assert index.get_windows("1", 4) == []
+    assert index.get_windows("unknown", 1) == []
+
+
+def test_get_windows_inclusive_after():
+    index = build_index({10, 11, 12})
+    # A run starting on `after` counts in full
+    assert index.get_windows("1", 3, after=night(10)) == [(night(10), night(12))]
+    # A run ending exactly `nights - 1` nights after `after` still fits
+    assert index.get_windows("1", 1, after=night(12)) == [(night(12), night(12))]
+    assert index.get_windows("1", 2, after=night(11)) == [(night(11), night(12))]
+    assert index.get_windows("1", 2, after=night(12)) == []
+
+
+def test_get_windows_inclusive_before():
+    index = build_index({10, 11, 12})
+    # A run ending on `before` counts in full
+    assert index.get_windows("1", 3, before=night(12)) == [(night(10), night(12))]
+    # A run starting on `before` holds a one-night window
+    assert index.get_windows("1", 1, before=night(10)) == [(night(10), night(10))]
+    assert index.get_windows("1", 2, before=night(11)) == [(night(10), night(11))]
+    assert index.get_windows("1", 2, before=night(10)) == []
+
+
+def test_get_windows_inclusive_after_and_before():
+    index = build_index({1, 2, 3, 10, 11, 12, 20, 21})
+    assert index.get_windows("1", 3, after=night(10), before=night(12)) == [
+        (night(10), night(12))
+    ]
+    assert index.get_windows("1", 1, after=night(3), before=night(20)) == [
+        (night(3), night(3)),
+        (night(10), night(12)),
+        (night(20), night(20)),
+    ]
+    assert index.find_facilities(3, after=night(10), before=night(12)) == ["1"]
+    assert index.find_facilities(3, after=night(11), before=night(13)) == []
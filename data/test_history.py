@@ -0,0 +1,88 @@
+import sqlite3
+
+from history import AvailabilityHistory
+
+
+DAY = 24 * 60 * 60
+# Midnight on 2022-06-01, UTC
+JUNE_1 = 1654041600
+
+
+def record(history, observed_at, availability):
+    return history.record(
+        [{"metadata": {"facility_id": "1"}, "availability": availability}],
+        observed_at,
+    )
+
+
+def build_history(path):
+    history = AvailabilityHistory(path)
+    record(history, JUNE_1, {"2022-06-10": True, "2022-06-11": True})
+    record(history, JUNE_1 + DAY, {"2022-06-10": False, "2022-06-11": True})
+    record(history, JUNE_1 + 2 * DAY, {"2022-06-10": True, "2022-06-11": False})
+    # Passed nights becoming unavailable aren't bookings
+    record(history, JUNE_1 + 20 * DAY, {"2022-06-10": False, "2022-06-11": False})
+    return history
+
+
+EXPECTED_TRANSITIONS = [
+    ("1", "2022-06-10", JUNE_1 + DAY, False),
+    ("1", "2022-06-10", JUNE_1 + 2 * DAY, True),
+    ("1", "2022-06-11", JUNE_1 + 2 * DAY, False),
+]
+
+
+def test_record_only_changes(tmp_path):
+    history = AvailabilityHistory(str(tmp_path / "history.sqlite"))
+    assert record(history, JUNE_1, {"2022-06-10": True}) == 1
+    assert record(history, JUNE_1 + DAY, {"2022-06-10": True}) == 0
+    assert record(history, JUNE_1 + 2 * DAY, {"2022-06-10": False}) == 1
+    assert history.get_night_history("1", "2022-06-10") == [
+        (JUNE_1, True),
+        (JUNE_1 + 2 * DAY, False),
+    ]
+
+
+def test_transitions(tmp_path):
+    history = build_history(str(tmp_path / "history.sqlite"))
+    assert history.get_transitions() == EXPECTED_TRANSITIONS
+    assert history.get_transitions("1") == EXPECTED_TRANSITIONS
+    assert history.get_transitions("2") == []
+    # Transitions are found even when the observation before them
+    # predates the period
+    assert history.get_transitions(since=JUNE_1 + 2 * DAY) == EXPECTED_TRANSITIONS[1:]
+    assert history.get_transitions(until=JUNE_1 + 2 * DAY) == EXPECTED_TRANSITIONS[:1]
+    assert history.get_demand() == {"1": {"bookings": 2, "cancellations": 1}}
+    assert history.get_booking_velocity("1") == {"2022-06-02": 1, "2022-06-03": 1}
+    assert history.get_booking_lead_times("1") == {
+        "2022-06-10": 8.0,
+        "2022-06-11": 8.0,
+    }
+
+
+def test_migrate_history_without_was_available(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    build_history(path).close()
+    # Recreate the history as it was saved before it had a
+    # `was_available` column
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executescript("""
+            CREATE TABLE old_observations (
+                facility_id TEXT NOT NULL,
+                night TEXT NOT NULL,
+                observed_at REAL NOT NULL,
+                is_available INTEGER NOT NULL,
+                PRIMARY KEY (facility_id, night, observed_at)
+            ) WITHOUT ROWID;
+            INSERT INTO old_observations
+                SELECT facility_id, night, observed_at, is_available
+                FROM observations;
+            DROP TABLE observations;
+            ALTER TABLE old_observations RENAME TO observations;
+            """)
+    connection.close()
+
+    history = AvailabilityHistory(path)
+    assert history.get_transitions() == EXPECTED_TRANSITIONS
+    assert record(history, JUNE_1 + 21 * DAY, {"2022-06-12": True}) == 1
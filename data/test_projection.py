@@ -0,0 +1,102 @@
+import pytest
+
+from projection import Derive, Drop, Keep, Projection, ProjectionError
+
+
+def test_keep():
+    project = Projection(
+        "test",
+        [
+            Keep("a"),
+            Keep("b", rename="renamed"),
+            Keep("c", transform=lambda value: value * 2),
+        ],
+    )
+    assert project({"a": 1, "b": 2, "c": 3}) == {"a": 1, "renamed": 2, "c": 6}
+
+
+def test_keep_none():
+    # `None` is a value like any other, rather than a missing field
+    project = Projection("test", [Keep("a")])
+    assert project({"a": None}) == {"a": None}
+
+
+def test_keep_required():
+    project = Projection("test", [Keep("a"), Keep("b", required=False)])
+    assert project({"a": 1}) == {"a": 1}
+    with pytest.raises(ProjectionError):
+        project({"b": 2})
+
+
+def test_drop():
+    project = Projection("test", [Keep("a"), Drop("b"), Drop("c")])
+    assert project({"a": 1, "b": 2}) == {"a": 1}
+
+
+def test_derive():
+    project = Projection(
+        "test",
+        [
+            Keep("a"),
+            Derive("total", lambda data: data["b"] + data["c"], sources=["b", "c"]),
+            Keep("d"),
+        ],
+        keep_unexpected=True,
+    )
+    output = project({"a": 1, "b": 2, "c": 3, "d": 4})
+    assert output == {"a": 1, "total": 5, "d": 4}
+    # Fields are output in the order they're declared
+    assert list(output) == ["a", "total", "d"]
+    assert not project.warnings.counts
+
+
+def test_expect():
+    project = Projection(
+        "test",
+        [
+            Keep("a", expect=1),
+            Keep("b", expect=lambda value: value > 0, transform=str),
+            Drop("c", expect=None),
+            Drop("d", expect=lambda value: not value),
+            Keep("e", expect=1, required=False),
+        ],
+    )
+    assert project({"a": 1, "b": 2, "c": 3, "d": False}) == {"a": 1, "b": "2"}
+    assert not project.warnings.counts
+
+    # Unexpected values are counted, and kept or dropped all the same
+    assert project({"a": 2, "b": -2, "d": True}) == {"a": 2, "b": "-2"}
+    assert project({"a": 3, "b": 2, "d": True}) == {"a": 3, "b": "2"}
+    assert project.warnings.counts == {
+        "unexpected value: a": 2,
+        "unexpected value: b": 1,
+        "unexpected value: d": 2,
+    }
+
+
+def test_keep_unexpected():
+    fields = [
+        Keep("a"),
+        Drop("b"),
+        Derive("c", lambda data: data["d"], sources=["d"]),
+    ]
+    data = {"a": 1, "b": 2, "d": 3, "e": 4, "f": 5}
+
+    project = Projection("test", fields)
+    assert project(data) == {"a": 1, "c": 3}
+    assert not project.warnings.counts
+
+    project = Projection("test", fields, keep_unexpected=True)
+    assert project(data) == {"a": 1, "c": 3, "e": 4, "f": 5}
+    assert project(data) == {"a": 1, "c": 3, "e": 4, "f": 5}
+    assert project.warnings.counts == {
+        "unexpected field: e": 2,
+        "unexpected field: f": 2,
+    }
+
+
+def test_input_unchanged():
+    project = Projection("test", [Keep("a", rename="b"), Drop("c")])
+    data = {"a": 1, "c": 2}
+    project(data)
+    assert data == {"a": 1, "c": 2}
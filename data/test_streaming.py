@@ -0,0 +1,101 @@
+import json
+
+import pytest
+import requests
+
+from streaming import StreamParseError, iter_object_items
+
+
+def split(document, size):
+    encoded = document.encode("utf-8")
+    return [encoded[i : i + size] for i in range(0, len(encoded), size)]
+
+
+def parse(chunks, key="availabilities"):
+    return list(iter_object_items(chunks, key))
+
+
+AVAILABILITIES = {
+    "2022-06-15T00:00:00Z": "Reserved",
+    "2022-06-16T00:00:00Z": "Available",
+    "2022-06-17T00:00:00Z": "NYR",
+}
+DOCUMENT = json.dumps(
+    {
+        "availability": {
+            "campsite_id": "1",
+            "availabilities": AVAILABILITIES,
+            "quantities": {night: 1 for night in AVAILABILITIES},
+        }
+    },
+    indent=4,
+)
+
+
+def test_whole_document():
+    assert parse([DOCUMENT.encode("utf-8")]) == list(AVAILABILITIES.items())
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, 64])
+def test_chunk_boundaries(size):
+    # Every key, value, and separator ends up split across chunks at
+    # some size or other
+    assert parse(split(DOCUMENT, size)) == list(AVAILABILITIES.items())
+
+
+def test_key_split_across_chunks():
+    document = '{"padding": "' + "x" * 100 + '", "availabilities": {"a": "b"}}'
+    boundary = document.index("availabilities") + 5
+    encoded = document.encode("utf-8")
+    assert parse([encoded[:boundary], encoded[boundary:]]) == [("a", "b")]
+
+
+def test_utf8_split_across_chunks():
+    document = json.dumps(
+        {"availabilities": {"night": "Réservé ⛺"}}, ensure_ascii=False
+    )
+    assert parse(split(document, 1)) == [("night", "Réservé ⛺")]
+
+
+def test_null():
+    assert parse(split('{"availabilities": null, "quantities": {}}', 4)) == []
+
+
+def test_empty_object():
+    assert parse(split('{"availabilities": {}, "quantities": {"a": 1}}', 4)) == []
+    assert parse([b'{"availabilities":{ }}']) == []
+
+
+def test_stops_reading_after_object():
+    chunks = iter([b'{"availabilities": {"a": "b"}', b"never read"])
+    assert parse(chunks) == [("a", "b")]
+    assert next(chunks) == b"never read"
+
+
+def test_html_body():
+    with pytest.raises(requests.exceptions.JSONDecodeError):
+        parse([b"<!DOCTYPE html>\n<html><body>Forbidden</body></html>"])
+
+
+def test_empty_body():
+    with pytest.raises(requests.exceptions.JSONDecodeError):
+        parse([])
+    with pytest.raises(requests.exceptions.JSONDecodeError):
+        parse([b"", b"  \n"])
+
+
+@pytest.mark.parametrize("value", ["1", "true", "null", '{"a": "b"}', '"esc\\"aped"'])
+def test_unsupported_value(value):
+    document = '{"availabilities": {"a": "b", "c": ' + value + "}}"
+    with pytest.raises(StreamParseError):
+        parse(split(document, 5))
+
+
+def test_missing_object():
+    with pytest.raises(StreamParseError):
+        parse(split('{"quantities": {"a": 1}}', 4))
+
+
+def test_truncated_object():
+    with pytest.raises(StreamParseError):
+        parse(split('{"availabilities": {"a": "b", "c"', 4))
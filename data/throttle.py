@@ -0,0 +1,129 @@
+import json
+import re
+import threading
+import time
+
+import atomic_file
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. An instance can be shared by every
+    worker thread, so that its request rate is respected globally no
+    matter how many requests are in flight at once
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+    def acquire(self):
+        """Block until a token is available; return the seconds spent waiting"""
+        waited = 0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class AdaptiveRateLimiter:
+    """
+    Learns how quickly each family of endpoints can be requested,
+    using additive-increase/multiplicative-decrease: every healthy
+    response nudges that family's rate up, and every throttled response
+    cuts it. Each family has its own token bucket; `families` is a list
+    of `(name, URL pattern)` pairs, where the first match applies.
+    Every request also takes a token from one shared bucket, limited to
+    `total_rate`, so that the families split a single budget between
+    them, however high their own rates climb.
+    """
+
+    def __init__(
+        self,
+        families,
+        initial_rate,
+        min_rate,
+        max_rate,
+        additive_increase,
+        multiplicative_decrease,
+        total_rate,
+    ):
+        self.families = [(name, re.compile(pattern)) for name, pattern in families]
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        # The total time that callers have spent blocked, waiting for
+        # their turn to make a request
+        self.total_wait_seconds = 0
+        self._wait_lock = threading.Lock()
+        self.buckets = {
+            name: TokenBucket(self._clamp(initial_rate))
+            for name, _ in self.families + [("other", None)]
+        }
+        self.total_bucket = TokenBucket(total_rate)
+
+    def get_family(self, url):
+        for name, pattern in self.families:
+            if pattern.search(url):
+                return name
+        return "other"
+
+    def acquire(self, url):
+        """Block until a request to this URL may be made; return the seconds waited"""
+        waited = self.buckets[self.get_family(url)].acquire()
+        waited += self.total_bucket.acquire()
+        with self._wait_lock:
+            self.total_wait_seconds += waited
+        return waited
+
+    def _clamp(self, rate):
+        return min(self.max_rate, max(self.min_rate, rate))
+
+    def _adjust(self, url, get_new_rate):
+        bucket = self.buckets[self.get_family(url)]
+        bucket.set_rate(self._clamp(get_new_rate(bucket.rate)))
+        return bucket.rate
+
+    def on_success(self, url):
+        return self._adjust(url, lambda rate: rate + self.additive_increase)
+
+    def on_throttled(self, url):
+        return self._adjust(url, lambda rate: rate * self.multiplicative_decrease)
+
+    def get_rates(self):
+        return {name: bucket.rate for name, bucket in self.buckets.items()}
+
+    def load_rates(self, path):
+        """Start from the rates learned during a previous run, if there are any"""
+        try:
+            with open(path, "r") as f:
+                rates = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        for name, rate in rates.items():
+            if name in self.buckets:
+                self.buckets[name].set_rate(self._clamp(rate))
+
+    def save_rates(self, path):
+        atomic_file.write_json(path, self.get_rates(), indent=4)
@@ -0,0 +1,309 @@
+#! /usr/bin/env python3
+
+"""
+Keep watching a list of facilities for cancellations, polling each one's
+availability as often as the rate limit allows and its demand warrants,
+and emit an event whenever a stay on the watchlist becomes available or
+gets booked.
+
+The watchlist is a JSON list of entries like:
+
+    {"facility_id": "234097", "after": "2026-07-01", "before": "2026-07-31", "nights": 2}
+
+Dates are inclusive nights, as for `AvailabilityIndex`. Facilities that
+change often, or that are watched for nights in the near future, are
+polled more often. The last-seen availability is saved after every poll,
+so that a restarted daemon picks up where it left off, without
+re-announcing what it had already seen.
+"""
+
+import argparse
+import datetime
+import heapq
+import json
+import logging
+import os
+import sys
+import time
+
+import requests
+
+import atomic_file
+from availability_index import AvailabilityIndex
+import config
+from get_availability import (
+    campsite_map,
+    get_campsites,
+    get_facility_availability,
+    http_client,
+    rate_limiter,
+)
+
+
+logger = logging.getLogger(__file__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.INFO)
+
+
+def load_watchlist(path):
+    """Group the watchlist's entries by facility, dropping any that have passed"""
+    with open(path, "r") as f:
+        entries = json.load(f)
+
+    today = datetime.date.today()
+    watchlist = {}
+    for entry in entries:
+        entry = {
+            "facility_id": str(entry["facility_id"]),
+            "after": datetime.date.fromisoformat(entry["after"]),
+            "before": datetime.date.fromisoformat(entry["before"]),
+            "nights": entry.get("nights", 1),
+        }
+        if entry["before"] >= today:
+            watchlist.setdefault(entry["facility_id"], []).append(entry)
+    return watchlist
+
+
+def get_watched_nights(entries, availability):
+    """Trim a facility's availability down to the nights that are watched"""
+    return {
+        night: is_available
+        for night, is_available in (availability or {}).items()
+        if any(
+            entry["after"].isoformat() <= night <= entry["before"].isoformat()
+            for entry in entries
+        )
+    }
+
+
+def get_events(facility_id, entries, previous, current):
+    """
+    Compare two observations of a facility's availability, and describe
+    each watched stay that became available, or that was available and
+    no longer is
+    """
+    previous_index = AvailabilityIndex(
+        [{"metadata": {"facility_id": facility_id}, "availability": previous or None}]
+    )
+    current_index = AvailabilityIndex(
+        [{"metadata": {"facility_id": facility_id}, "availability": current or None}]
+    )
+
+    def get_nights(window):
+        first_night, last_night = window
+        return {
+            (first_night + datetime.timedelta(days=i)).isoformat()
+            for i in range((last_night - first_night).days + 1)
+        }
+
+    events = []
+    for entry in entries:
+        args = (facility_id, entry["nights"], entry["after"], entry["before"])
+        previous_windows = previous_index.get_windows(*args)
+        current_windows = current_index.get_windows(*args)
+        previous_nights = set().union(*map(get_nights, previous_windows))
+        current_nights = set().union(*map(get_nights, current_windows))
+
+        for event_type, windows, changed_nights in [
+            ("available", current_windows, current_nights - previous_nights),
+            ("booked", previous_windows, previous_nights - current_nights),
+        ]:
+            for window in windows:
+                nights = sorted(get_nights(window) & changed_nights)
+                if nights:
+                    events.append(
+                        {
+                            "event": event_type,
+                            "facility_id": facility_id,
+                            "first_night": window[0].isoformat(),
+                            "last_night": window[1].isoformat(),
+                            "changed_nights": nights,
+                            "watch": {
+                                "after": entry["after"].isoformat(),
+                                "before": entry["before"].isoformat(),
+                                "nights": entry["nights"],
+                            },
+                        }
+                    )
+    return events
+
+
+def get_max_poll_interval(entries):
+    """Poll more often for stays in the near future, which book up fastest"""
+    near_term_until = datetime.date.today() + datetime.timedelta(
+        days=config.WATCH_NEAR_TERM_DAYS
+    )
+    if any(entry["after"] <= near_term_until for entry in entries):
+        return config.WATCH_NEAR_TERM_MAX_POLL_INTERVAL_SECONDS
+    return config.WATCH_MAX_POLL_INTERVAL_SECONDS
+
+
+def get_next_poll_interval(interval, entries, has_changed):
+    """
+    Halve a facility's polling interval whenever its availability changes,
+    since that's a sign of high demand, and lengthen it while it doesn't
+    """
+    if has_changed:
+        interval *= config.WATCH_POLL_INTERVAL_DECREASE
+    else:
+        interval *= config.WATCH_POLL_INTERVAL_INCREASE
+    return min(
+        max(interval, config.WATCH_MIN_POLL_INTERVAL_SECONDS),
+        get_max_poll_interval(entries),
+    )
+
+
+class EventEmitter:
+    """Send change events to stdout, an append-only JSONL file, and/or a webhook"""
+
+    def __init__(self, stdout=True, path=None, webhook_url=None):
+        self.stdout = stdout
+        self.path = path
+        self.webhook_url = webhook_url
+
+    def emit(self, event):
+        line = json.dumps(event)
+        if self.stdout:
+            print(line, flush=True)
+        if self.path is not None:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+        if self.webhook_url is not None:
+            try:
+                http_client.request("POST", self.webhook_url, json=event, timeout=10)
+            except requests.exceptions.RequestException as e:
+                logger.warning(
+                    "Failed to send event to webhook: {}: {}".format(
+                        type(e).__name__, e
+                    )
+                )
+
+
+def load_state(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(path, state):
+    atomic_file.write_json(path, state)
+
+
+def poll(facility_id, entries, state, emitter):
+    """Poll a facility's availability once, emit any changes, and update its state"""
+    facility_state = state.get(facility_id)
+    campsite_ids = [campsite["campsite_id"] for campsite in get_campsites(facility_id)]
+    current = get_watched_nights(entries, get_facility_availability(campsite_ids))
+    previous = facility_state["availability"] if facility_state else {}
+
+    events = get_events(facility_id, entries, previous, current)
+    for event in events:
+        emitter.emit({**event, "observed_at": time.time()})
+
+    interval = (
+        facility_state["interval"]
+        if facility_state
+        else config.WATCH_MIN_POLL_INTERVAL_SECONDS
+    )
+    state[facility_id] = {
+        "availability": current,
+        "interval": get_next_poll_interval(
+            interval, entries, facility_state is not None and current != previous
+        ),
+        "polled_at": time.time(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--data-dir",
+        default=sys.path[0],
+        help="Where the watchlist is, and where to keep state between runs",
+    )
+    parser.add_argument(
+        "--events-file", help="Also append each event to this JSONL file"
+    )
+    parser.add_argument("--webhook-url", help="Also POST each event to this URL")
+    parser.add_argument(
+        "--quiet", action="store_true", help="Don't print events to stdout"
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Poll every watched facility once, then exit",
+    )
+    args = parser.parse_args(argv)
+
+    watchlist_path = os.path.join(args.data_dir, config.WATCHLIST_FILE_NAME)
+    state_path = os.path.join(args.data_dir, config.WATCH_STATE_FILE_NAME)
+    learned_rates_path = os.path.join(args.data_dir, config.LEARNED_RATES_FILE_NAME)
+    campsite_map_path = os.path.join(args.data_dir, config.CAMPSITE_MAP_FILE_NAME)
+
+    # Share the scraper's learned request rates and campsite map, so that
+    # the daemon stays within the same rate limits
+    rate_limiter.load_rates(learned_rates_path)
+    campsite_map.load(campsite_map_path)
+    emitter = EventEmitter(
+        stdout=not args.quiet, path=args.events_file, webhook_url=args.webhook_url
+    )
+    state = load_state(state_path)
+
+    watchlist = {}
+    watchlist_modified_at = None
+    queue = []
+    try:
+        while True:
+            # Pick up edits to the watchlist without needing a restart
+            modified_at = os.path.getmtime(watchlist_path)
+            if modified_at != watchlist_modified_at:
+                watchlist = load_watchlist(watchlist_path)
+                watchlist_modified_at = modified_at
+                queue = [
+                    (
+                        (
+                            state[i]["polled_at"] + state[i]["interval"]
+                            if i in state
+                            else 0
+                        ),
+                        i,
+                    )
+                    for i in watchlist
+                ]
+                heapq.heapify(queue)
+                logger.info("Watching {} facilities".format(len(watchlist)))
+            if not queue:
+                return
+
+            due_at, facility_id = heapq.heappop(queue)
+            if args.once:
+                due_at = 0
+            time.sleep(max(0, due_at - time.time()))
+            try:
+                poll(facility_id, watchlist[facility_id], state, emitter)
+            except Exception as e:
+                logger.warning(
+                    "Failed to poll facility {}: {}: {}".format(
+                        facility_id, type(e).__name__, e
+                    )
+                )
+            else:
+                save_state(state_path, state)
+
+            if not args.once:
+                facility_state = state.get(facility_id)
+                interval = (
+                    facility_state["interval"]
+                    if facility_state
+                    else config.WATCH_MIN_POLL_INTERVAL_SECONDS
+                )
+                heapq.heappush(queue, (time.time() + interval, facility_id))
+    finally:
+        rate_limiter.save_rates(learned_rates_path)
+        campsite_map.save(campsite_map_path)
+
+
+if __name__ == "__main__":
+    main()
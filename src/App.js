@@ -5,6 +5,8 @@ import Filters from "./components/Filters";
 import Logotype from "./components/Logotype";
 import Map from "./components/Map";
 import Attribution from "./components/Attribution";
+import { fetchRecords } from "./publishedData";
+import { decodeAvailability, getAvailableRuns } from "./utils";
 
 class App extends Component {
   constructor(props) {
@@ -43,11 +45,15 @@ class App extends Component {
   };
 
   componentDidMount = () => {
-    fetch("https://lookouthunter.s3.amazonaws.com/availability.json")
-      .then((response) => response.json())
-      .then((data) => {
-        this.setState({ data });
+    fetchRecords().then((data) => {
+      this.setState({
+        data: data.map((item) => ({
+          ...item,
+          availability: decodeAvailability(item.availability),
+          availableRuns: getAvailableRuns(item.availability),
+        })),
       });
+    });
   };
 
   onChangeConsecutiveNights = (e) => {
@@ -1,6 +1,14 @@
-import { isValid } from "date-fns";
-import { parseAvailabilityDate } from "./utils";
-
+import {
+  differenceInCalendarDays,
+  isValid,
+  max,
+  min,
+  startOfDay,
+} from "date-fns";
+
+// Both dates are inclusive, and refer to nights. Only calendar days are
+// compared, since the date pickers' values may carry a time of day.
+// This mirrors `AvailabilityIndex` in `data/availability_index.py`.
 const checkDateFilters = (item, consecutiveNights, afterDate, beforeDate) => {
   if (item.availability === null) {
     return false;
@@ -13,29 +21,17 @@ const checkDateFilters = (item, consecutiveNights, afterDate, beforeDate) => {
   const afterDateIsSet = isValid(afterDate);
   const beforeDateIsSet = isValid(beforeDate);
 
-  let consecutiveNightsSeen = 0;
-  for (const [night, isNightAvailable] of Object.entries(item.availability)) {
-    const nightDate = parseAvailabilityDate(night);
-    // TODO: This filter seems to apply itself one night off, but the bug has
-    // been a little tricky to fix
-    if (afterDateIsSet && nightDate < afterDate) {
-      continue;
-    }
-    if (beforeDateIsSet && nightDate > beforeDate) {
-      break;
-    }
-
-    if (isNightAvailable) {
-      consecutiveNightsSeen += 1;
-    } else {
-      consecutiveNightsSeen = 0;
-    }
-
-    if (consecutiveNightsSeen >= consecutiveNights) {
-      return true;
-    }
-  }
-  return false;
+  return item.availableRuns.some(({ firstNight, lastNight }) => {
+    const windowStart = afterDateIsSet
+      ? max([firstNight, startOfDay(afterDate)])
+      : firstNight;
+    const windowEnd = beforeDateIsSet
+      ? min([lastNight, startOfDay(beforeDate)])
+      : lastNight;
+    return (
+      differenceInCalendarDays(windowEnd, windowStart) + 1 >= consecutiveNights
+    );
+  });
 };
 
 const checkCellCarrierFilter = (item, cellCarrier) => {
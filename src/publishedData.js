@@ -0,0 +1,93 @@
+// The scraped data is published as versioned patches, plus periodic full
+// snapshots (see `data/publish_deltas.py`). Keep the latest version in
+// local storage, so that on later visits only the patches since then
+// need to be downloaded.
+const DATA_URL = "https://lookouthunter.s3.amazonaws.com";
+const STORAGE_KEY = "availability";
+
+const fetchVerified = async (path, sha256) => {
+  const response = await fetch(`${DATA_URL}/${path}`);
+  const body = await response.arrayBuffer();
+  const digest = await crypto.subtle.digest("SHA-256", body);
+  const hash = Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, "0"))
+    .join("");
+  if (hash !== sha256) {
+    throw new Error(`Found an unexpected content hash for ${path}`);
+  }
+  return JSON.parse(new TextDecoder().decode(body));
+};
+
+// This mirrors `apply_patch` in `data/publish_deltas.py`
+const applyPatch = (records, patch) => {
+  const byFacilityId = {};
+  for (const record of records) {
+    byFacilityId[record.metadata.facility_id] = record;
+  }
+  for (const facilityId of patch.removed) {
+    delete byFacilityId[facilityId];
+  }
+  for (const [facilityId, fields] of Object.entries(patch.updated)) {
+    byFacilityId[facilityId] = { ...byFacilityId[facilityId], ...fields };
+  }
+  Object.assign(byFacilityId, patch.upserted);
+  return patch.order.map((facilityId) => byFacilityId[facilityId]);
+};
+
+const loadStoredVersion = () => {
+  try {
+    return JSON.parse(localStorage.getItem(STORAGE_KEY));
+  } catch {
+    return null;
+  }
+};
+
+const fetchPublishedRecords = async () => {
+  const response = await fetch(`${DATA_URL}/manifest.json`, {
+    cache: "no-cache",
+  });
+  const manifest = await response.json();
+
+  let { version, sha256, records } = loadStoredVersion() || {};
+  if (version === manifest.version && sha256 === manifest.sha256) {
+    return records;
+  }
+  // Start over from the snapshot if the patches can't bring the stored
+  // version up to date
+  if (!manifest.patches.some((patch) => patch.version === version + 1)) {
+    records = await fetchVerified(
+      manifest.snapshot.path,
+      manifest.snapshot.sha256,
+    );
+    version = manifest.snapshot.version;
+  }
+  for (const patch of manifest.patches) {
+    if (patch.version > version) {
+      records = applyPatch(
+        records,
+        await fetchVerified(patch.path, patch.sha256),
+      );
+      version = patch.version;
+    }
+  }
+
+  try {
+    localStorage.setItem(
+      STORAGE_KEY,
+      JSON.stringify({ version, sha256: manifest.sha256, records }),
+    );
+  } catch {
+    // Storage may be full or disabled, in which case the next visit
+    // will just start from the snapshot again
+  }
+  return records;
+};
+
+// Fall back to the full file if anything goes wrong with the patches,
+// or if they haven't been published yet
+const fetchRecords = () =>
+  fetchPublishedRecords().catch(() =>
+    fetch(`${DATA_URL}/availability.json`).then((response) => response.json()),
+  );
+
+export { fetchRecords };
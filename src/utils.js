@@ -1,9 +1,69 @@
-import { parse, format } from "date-fns";
+import { addDays, differenceInCalendarDays, parse, format } from "date-fns";
 import { startCase } from "lodash";
 
 const parseAvailabilityDate = (dateString) =>
   parse(dateString, "yyyy-MM-dd", new Date());
 
+const formatAvailabilityDate = (date) => format(date, "yyyy-MM-dd");
+
+// The published data compactly encodes each facility's availability as
+// runs of available nights (see `data/availability_encoding.py`).
+// Expand that back into a mapping of every night to whether it's
+// available. Data without a `version` is already in that legacy format.
+const decodeAvailability = (encoded) => {
+  if (encoded === null || encoded.version === undefined) {
+    return encoded;
+  }
+
+  const firstNight = parseAvailabilityDate(encoded.first_night);
+  const lastNight = parseAvailabilityDate(encoded.last_night);
+  const availability = {};
+  for (let i = 0; i <= differenceInCalendarDays(lastNight, firstNight); i++) {
+    availability[formatAvailabilityDate(addDays(firstNight, i))] = false;
+  }
+  for (const [offset, length] of encoded.available) {
+    for (let i = offset; i < offset + length; i++) {
+      availability[formatAvailabilityDate(addDays(firstNight, i))] = true;
+    }
+  }
+  return availability;
+};
+
+// Return the runs of available nights, in order, as `{ firstNight,
+// lastNight }` dates. This mirrors `get_available_runs` in
+// `data/availability_encoding.py`.
+const getAvailableRuns = (encoded) => {
+  if (encoded === null) {
+    return [];
+  }
+
+  if (encoded.version !== undefined) {
+    const firstNight = parseAvailabilityDate(encoded.first_night);
+    return encoded.available.map(([offset, length]) => ({
+      firstNight: addDays(firstNight, offset),
+      lastNight: addDays(firstNight, offset + length - 1),
+    }));
+  }
+
+  const runs = [];
+  for (const night of Object.keys(encoded).sort()) {
+    if (!encoded[night]) {
+      continue;
+    }
+    const nightDate = parseAvailabilityDate(night);
+    const lastRun = runs[runs.length - 1];
+    if (
+      lastRun !== undefined &&
+      differenceInCalendarDays(nightDate, lastRun.lastNight) === 1
+    ) {
+      lastRun.lastNight = nightDate;
+    } else {
+      runs.push({ firstNight: nightDate, lastNight: nightDate });
+    }
+  }
+  return runs;
+};
+
 const reformatDate = (dateString) => {
   const date = parseAvailabilityDate(dateString);
   return format(date, "MMMM d (E)");
@@ -37,6 +97,8 @@ const isLikelyClosed = (availability) =>
 
 export {
   parseAvailabilityDate,
+  decodeAvailability,
+  getAvailableRuns,
   reformatDate,
   formatFacilityName,
   isLikelyClosed,